@@ -2,16 +2,29 @@
 from __future__ import annotations
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
+from homeassistant.helpers.dispatcher import async_dispatcher_send
 from .navien_api import (
+    LIVENESS_MISSED,
     NavilinkConnect
 )
-from .const import DOMAIN
+from .const import DOMAIN, SIGNAL_OPTIONS_UPDATED
+from .services import async_setup_services
+from .view import NavienMetricsView
 import logging
 import os
 _LOGGER=logging.getLogger(__name__)
 
 PLATFORMS: list[str] = ["water_heater","sensor","switch"]
 
+# Options the hub is built with, changing them reloads the entry, the others are applied in place
+RELOAD_OPTIONS = {
+    "capture_traffic": False,
+    "export_telemetry": False,
+    "telemetry_format": "ndjson",
+    "telemetry_fields": "",
+    "loop_watchdog": False,
+}
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Navien NaviLink Water Heater Integration from a config entry."""
 
@@ -20,12 +33,39 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     subdirs = ['custom_components','navien_water_heater','cert']
     for subdir in subdirs:
         aws_path = os.path.join(aws_path,subdir)
-    navilink = NavilinkConnect(userId=entry.data.get("username",""), passwd=entry.data.get("password",""), polling_interval=entry.data.get("polling_interval",15), device_index=entry.data.get("device_index",0), aws_cert_path=os.path.join(aws_path,"AmazonRootCA1.pem"))
+    capture_path = None
+    if entry.options.get("capture_traffic",False):
+        capture_path = hass.config.path(DOMAIN + "_capture", entry.entry_id)
+    telemetry_path = None
+    if entry.options.get("export_telemetry",False):
+        telemetry_path = hass.config.path(DOMAIN + "_telemetry", entry.entry_id)
+    navilink = NavilinkConnect(userId=entry.data.get("username",""), passwd=entry.data.get("password",""), polling_interval=entry.options.get("polling_interval",entry.data.get("polling_interval",15)), device_index=entry.data.get("device_index",0), aws_cert_path=os.path.join(aws_path,"AmazonRootCA1.pem"), capture_path=capture_path, telemetry_path=telemetry_path, telemetry_format=entry.options.get("telemetry_format","ndjson"), telemetry_fields=entry.options.get("telemetry_fields",""), refresh_window=entry.options.get("refresh_window",120)*60, loop_watchdog=entry.options.get("loop_watchdog",False), liveness_missed=entry.options.get("liveness_missed",LIVENESS_MISSED), subscribe_all_topics=entry.options.get("subscribe_all_topics",False))
     hass.data[DOMAIN][entry.entry_id] = navilink
+    hass.data.setdefault(DOMAIN + "_built_options", {})[entry.entry_id] = {key: entry.options.get(key, default) for key, default in RELOAD_OPTIONS.items()}
     await navilink.start()    
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    if not hass.data.get(DOMAIN + "_metrics_view"):
+        hass.http.register_view(NavienMetricsView(hass))
+        hass.data[DOMAIN + "_metrics_view"] = True
+    async_setup_services(hass)
+    entry.async_on_unload(entry.add_update_listener(async_update_options))
     return True
 
+async def async_update_options(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Apply changed options to the running hub and sensors, reloading only for options the hub is built with."""
+    built_options = hass.data[DOMAIN + "_built_options"].get(entry.entry_id, {})
+    if any(entry.options.get(key, default) != built_options.get(key, default) for key, default in RELOAD_OPTIONS.items()):
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
+    navilink = hass.data[DOMAIN][entry.entry_id]
+    navilink.apply_options(
+        polling_interval=entry.options.get("polling_interval",entry.data.get("polling_interval",15)),
+        refresh_window=entry.options.get("refresh_window",120)*60,
+        liveness_missed=entry.options.get("liveness_missed",LIVENESS_MISSED),
+        subscribe_all_topics=entry.options.get("subscribe_all_topics",False),
+    )
+    async_dispatcher_send(hass, SIGNAL_OPTIONS_UPDATED.format(entry.entry_id), entry.options)
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     navilink = hass.data[DOMAIN][entry.entry_id]
@@ -33,5 +73,6 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
         hass.data[DOMAIN].pop(entry.entry_id)
+        hass.data[DOMAIN + "_built_options"].pop(entry.entry_id, None)
     return unload_ok
 
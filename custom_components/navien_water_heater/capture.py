@@ -0,0 +1,144 @@
+"""Raw MQTT traffic capture for the Navien NaviLink hub."""
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+CAPTURE_FILE_NAME = "capture.ndjson.gz"
+DIRECTION_IN = "in"
+DIRECTION_OUT = "out"
+
+class TrafficCapture:
+    """
+    Record every inbound and outbound MQTT message to rotating, gzip compressed NDJSON files.
+
+    record() only puts the raw message on a bounded queue, so it is safe to call from the SDK
+    callback thread or the executor. Decoding, serialization and file I/O all happen on a
+    dedicated writer thread and never on the event loop. When the queue is full the message
+    is dropped and counted rather than blocking the caller.
+    """
+
+    def __init__(self, path, max_bytes=5*1024*1024, backup_count=5, queue_size=10000) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        self.file = None
+        self.file_bytes = 0
+        self.recorded = 0
+        self.dropped = 0
+        self.drop_lock = threading.Lock()
+
+    def start(self):
+        if self.thread is None:
+            os.makedirs(self.path, exist_ok=True)
+            self.thread = threading.Thread(target=self._run, name="navien_capture", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """Flush pending records and stop the writer thread, blocks until done so call it from the executor"""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def record(self, direction, topic, payload, session_id=""):
+        try:
+            self.queue.put_nowait((time.monotonic(), direction, topic, session_id, payload))
+        except queue.Full:
+            with self.drop_lock:
+                self.dropped += 1
+
+    def wrap(self, callback):
+        """Return an SDK message callback that records the message before handing it to callback"""
+        def capture_callback(client, userdata, message):
+            self.record(DIRECTION_IN, message.topic, message.payload)
+            callback(client, userdata, message)
+        return capture_callback
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "queued": self.queue.qsize(),
+        }
+
+    def _run(self):
+        try:
+            while (item := self.queue.get()) is not None:
+                self._write(item)
+                # Drain whatever else is already queued before flushing
+                while True:
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        return
+                    self._write(item)
+                self.file.flush()
+        except Exception as e:
+            _LOGGER.error("Traffic capture stopped: " + str(type(e).__name__) + ": " + str(e))
+        finally:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def _write(self, item):
+        timestamp, direction, topic, session_id, payload = item
+        if isinstance(payload, (bytes, bytearray)):
+            payload = payload.decode("utf-8", errors="replace")
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            pass
+        if not session_id and isinstance(payload, dict):
+            session_id = payload.get("sessionID", "")
+        line = (json.dumps({"ts": timestamp, "topic": topic, "direction": direction, "session_id": session_id, "payload": payload}, separators=(',',':')) + "\n").encode("utf-8")
+        if self.file is None or self.file_bytes + len(line) > self.max_bytes:
+            self._rotate()
+        self.file.write(line)
+        self.file_bytes += len(line)
+        self.recorded += 1
+
+    def _rotate(self):
+        if self.file is not None:
+            self.file.close()
+        current = os.path.join(self.path, CAPTURE_FILE_NAME)
+        if os.path.exists(current):
+            for i in range(self.backup_count - 1, 0, -1):
+                source = rotated_file_name(self.path, i)
+                if os.path.exists(source):
+                    os.replace(source, rotated_file_name(self.path, i + 1))
+            if self.backup_count > 0:
+                os.replace(current, rotated_file_name(self.path, 1))
+        self.file = gzip.open(current, "wb")
+        self.file_bytes = 0
+
+def rotated_file_name(path, index):
+    return os.path.join(path, CAPTURE_FILE_NAME.replace(".ndjson", "." + str(index) + ".ndjson"))
+
+def read_capture(path):
+    """Yield captured records from a capture directory, oldest file first, for offline replay"""
+    files = []
+    index = 1
+    while os.path.exists(name := rotated_file_name(path, index)):
+        files.insert(0, name)
+        index += 1
+    if os.path.exists(current := os.path.join(path, CAPTURE_FILE_NAME)):
+        files.append(current)
+    for name in files:
+        try:
+            with gzip.open(name, "rt", encoding="utf-8") as file:
+                for line in file:
+                    yield json.loads(line)
+        except EOFError:
+            # The file currently being written may not have a complete gzip trailer yet
+            continue
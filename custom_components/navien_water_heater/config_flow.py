@@ -3,9 +3,12 @@ from __future__ import annotations
 from typing import Any
 import voluptuous as vol
 from homeassistant import config_entries
+from homeassistant.core import callback
 from homeassistant.data_entry_flow import FlowResult
 from .const import DOMAIN
-from .navien_api import NavilinkConnect
+from .navien_api import LIVENESS_MISSED, NavilinkConnect
+from .telemetry import FORMAT_NDJSON, TELEMETRY_FORMATS
+from .throttle import THROTTLED_SENSOR_TYPES, parse_deadband
 
 STEP_USER_DATA_SCHEMA = vol.Schema(
     {
@@ -32,6 +35,12 @@ class NavienConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     VERSION = 1
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        """Get the options flow for this handler."""
+        return NavienOptionsFlow(config_entry)
+
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
@@ -91,6 +100,69 @@ class NavienConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         if not existing_entry:
             return self.async_create_entry(title=title, data={"username":self.username, "password":self.password, "device_index":self.device_index, "polling_interval":user_input["polling_interval"]})
         else:
-            self.hass.config_entries.async_update_entry(existing_entry, data={"username":self.username, "password":self.password, "device_index":self.device_index, "polling_interval":user_input["polling_interval"]})
+            # The polling interval in the options overrides the one in the data, keep them in line
+            options = dict(existing_entry.options)
+            if "polling_interval" in options:
+                options["polling_interval"] = user_input["polling_interval"]
+            self.hass.config_entries.async_update_entry(existing_entry, data={"username":self.username, "password":self.password, "device_index":self.device_index, "polling_interval":user_input["polling_interval"]}, options=options)
             await self.hass.config_entries.async_reload(existing_entry.entry_id)
             return self.async_abort(reason="reauth_successful")
+
+class NavienOptionsFlow(config_entries.OptionsFlow):
+    """Handle options for a NaviLink gateway."""
+
+    def __init__(self, config_entry):
+        self.entry = config_entry
+        self.options = dict(config_entry.options)
+
+    async def async_step_init(
+        self, user_input = None
+    ) -> FlowResult:
+        """Manage the general options."""
+        if user_input is not None:
+            self.options.update(user_input)
+            return await self.async_step_throttling()
+
+        return self.async_show_form(
+            step_id="init", data_schema=vol.Schema(
+                {
+                    vol.Required("polling_interval", default=self.options.get("polling_interval",self.entry.data.get("polling_interval",15))): vol.All(vol.Coerce(int), vol.Range(min=10, max=120)),
+                    vol.Required("subscribe_all_topics", default=self.options.get("subscribe_all_topics",False)): bool,
+                    vol.Required("capture_traffic", default=self.options.get("capture_traffic",False)): bool,
+                    vol.Required("export_telemetry", default=self.options.get("export_telemetry",False)): bool,
+                    vol.Required("telemetry_format", default=self.options.get("telemetry_format",FORMAT_NDJSON)): vol.In(TELEMETRY_FORMATS),
+                    vol.Optional("telemetry_fields", default=self.options.get("telemetry_fields","")): str,
+                    vol.Required("refresh_window", default=self.options.get("refresh_window",120)): vol.All(vol.Coerce(int), vol.Range(min=0, max=360)),
+                    vol.Required("loop_watchdog", default=self.options.get("loop_watchdog",False)): bool,
+                    vol.Required("liveness_missed", default=self.options.get("liveness_missed",LIVENESS_MISSED)): vol.All(vol.Coerce(int), vol.Range(min=0, max=10)),
+                }
+            )
+        )
+
+    async def async_step_throttling(
+        self, user_input = None
+    ) -> FlowResult:
+        """Manage the sensor state write throttling."""
+        errors = {}
+        if user_input is not None:
+            # Deadbands are plain strings in the form, an absolute value or a percentage
+            for sensor_type in THROTTLED_SENSOR_TYPES:
+                field = sensor_type + "_deadband"
+                try:
+                    parse_deadband(user_input.get(field,"0"))
+                except ValueError:
+                    errors[field] = "invalid_deadband"
+                else:
+                    user_input[field] = str(user_input.get(field,"0")).strip()
+            self.options.update(user_input)
+            if not errors:
+                return self.async_create_entry(title="", data=self.options)
+
+        schema = {}
+        for sensor_type in THROTTLED_SENSOR_TYPES:
+            schema[vol.Required(sensor_type + "_deadband", default=self.options.get(sensor_type + "_deadband","0"))] = str
+            schema[vol.Required(sensor_type + "_min_interval", default=self.options.get(sensor_type + "_min_interval",0))] = vol.All(vol.Coerce(int), vol.Range(min=0, max=3600))
+            schema[vol.Required(sensor_type + "_heartbeat", default=self.options.get(sensor_type + "_heartbeat",0))] = vol.All(vol.Coerce(int), vol.Range(min=0, max=86400))
+        return self.async_show_form(
+            step_id="throttling", data_schema=vol.Schema(schema), errors=errors
+        )
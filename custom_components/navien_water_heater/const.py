@@ -1,3 +1,6 @@
 """Constants for Navien Water Heater integration."""
 
 DOMAIN = "navien_water_heater"
+
+# Dispatcher signal carrying a config entry's new options, formatted with the entry ID
+SIGNAL_OPTIONS_UPDATED = DOMAIN + "_options_updated_{}"
@@ -0,0 +1,84 @@
+"""Concurrent control of many NaviLink channels across hubs."""
+import asyncio
+
+from .navien_api import ControlFailed, TemperatureType
+
+MODE_POWER = "power"
+MODE_HOT_BUTTON = "hot_button"
+MODE_TEMPERATURE = "temperature"
+CONTROL_MODES = [MODE_POWER, MODE_HOT_BUTTON, MODE_TEMPERATURE]
+
+RESULT_OK = "ok"
+RESULT_TIMEOUT = "timeout"
+RESULT_FAILED = "failed"
+RESULT_BUSY = "busy"
+RESULT_UNAVAILABLE = "unavailable"
+RESULT_UNSUPPORTED = "unsupported"
+RESULT_ERROR = "error"
+
+DEFAULT_CONCURRENCY = 8
+
+def select_targets(hubs, gateways=None, channels=None):
+    """Return (hub, channel) pairs, filtered by gateway MAC address or name and by channel number when given"""
+    targets = []
+    for hub in hubs:
+        device_info = (hub.device_info or {}).get("deviceInfo",{})
+        if gateways and device_info.get("macAddress") not in gateways and device_info.get("deviceName") not in gateways:
+            continue
+        for channel in hub.channels.values():
+            if not channels or channel.channel_number in channels:
+                targets.append((hub, channel))
+    return targets
+
+async def async_control_channel(hub, channel, mode, value):
+    """Send one command and return its result, value is in the gateway's own temperature units"""
+    if not channel.is_available():
+        return RESULT_UNAVAILABLE
+    if channel.waiting_for_response:
+        return RESULT_BUSY
+    if mode == MODE_POWER:
+        acknowledged = await channel.set_power_state(bool(value))
+    elif mode == MODE_HOT_BUTTON:
+        if channel.channel_info.get("onDemandUse",2) != 1:
+            return RESULT_UNSUPPORTED
+        acknowledged = await channel.set_hot_button_state(bool(value))
+    elif mode == MODE_TEMPERATURE:
+        if channel.channel_info.get("temperatureType",2) == TemperatureType.CELSIUS.value:
+            value = round(2 * value)
+        else:
+            value = round(value)
+        acknowledged = await channel.set_temperature(value)
+    else:
+        return RESULT_UNSUPPORTED
+    return RESULT_OK if acknowledged else RESULT_TIMEOUT
+
+async def async_bulk_control(targets, mode, value, max_concurrency=DEFAULT_CONCURRENCY):
+    """
+    Send the same command to every (hub, channel) target concurrently, at most max_concurrency at a time
+
+    Returns one result per target with the gateway, channel, result and latency in seconds, in
+    the order of the targets. A fleet wide change takes about one command round trip per
+    max_concurrency targets instead of one per target.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    loop = asyncio.get_running_loop()
+
+    async def control(hub, channel):
+        async with semaphore:
+            started = loop.time()
+            try:
+                result = await async_control_channel(hub, channel, mode, value)
+            except ControlFailed as e:
+                result = RESULT_FAILED + ": fail code " + str(e.fail_code)
+            except Exception as e:
+                result = RESULT_ERROR + ": " + str(type(e).__name__) + ": " + str(e)
+            device_info = (hub.device_info or {}).get("deviceInfo",{})
+            return {
+                "gateway": device_info.get("deviceName","unknown"),
+                "mac_address": device_info.get("macAddress","unknown"),
+                "channel": channel.channel_number,
+                "result": result,
+                "latency": round(loop.time() - started, 3),
+            }
+
+    return await asyncio.gather(*[control(hub, channel) for hub, channel in targets])
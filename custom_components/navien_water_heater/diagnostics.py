@@ -0,0 +1,61 @@
+"""Diagnostics support for the Navien NaviLink Water Heater Integration."""
+from __future__ import annotations
+from typing import Any
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from .const import DOMAIN
+
+TO_REDACT = {
+    "username",
+    "password",
+    "userId",
+    "userSeq",
+    "email",
+    "token",
+    "accessToken",
+    "refreshToken",
+    "accessKeyId",
+    "secretKey",
+    "sessionToken",
+    "macAddress",
+    "additionalValue",
+    "homeSeq",
+    # The entry is titled with the username and its unique id is the gateway MAC address
+    "title",
+    "unique_id",
+}
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    navilink = hass.data[DOMAIN][entry.entry_id]
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "device_info": async_redact_data(navilink.device_info or {}, TO_REDACT),
+        "connected": navilink.connected,
+        "gateway_online": navilink.gateway_online,
+        "gateway_status_changed": navilink.gateway_status_changed.isoformat() if navilink.gateway_status_changed else None,
+        "polling_interval": navilink.polling_interval,
+        "last_poll": navilink.last_poll.isoformat() if navilink.last_poll else None,
+        "channels": {
+            channel_number: {
+                "channel_info": async_redact_data(channel.channel_info, TO_REDACT),
+                "channel_status": async_redact_data(channel.channel_status, TO_REDACT),
+                "subscribers": len(channel.callbacks),
+                "polled": bool(channel.callbacks),
+                "status_age": round(age, 1) if (age := channel.status_age()) is not None else None,
+            }
+            for channel_number, channel in navilink.channels.items()
+        },
+        "metrics": navilink.metrics.as_dict(),
+        "capture": navilink.capture.stats() if navilink.capture else None,
+        "telemetry": navilink.telemetry.stats() if navilink.telemetry else None,
+        "watchdog": navilink.watchdog.stats() if navilink.watchdog else None,
+        "executor": navilink.executor.stats() if navilink.executor else None,
+        "rate_budget": navilink.rate_budget.stats(navilink.userId),
+        "schedule": navilink.scheduler.stats(navilink.schedule_key, navilink.refresh_window),
+        "tasks": navilink.supervisor.stats(),
+        "liveness": navilink.liveness(),
+        "optional_topics": sorted(navilink.optional_topics),
+        "pending_requests": len(navilink.response_events),
+    }
@@ -0,0 +1,77 @@
+"""Base entity for the Navien NaviLink Water Heater Integration."""
+import weakref
+from homeassistant.const import UnitOfTemperature
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.entity import DeviceInfo, Entity
+from .const import DOMAIN
+from .navien_api import ControlFailed, TemperatureType
+
+class ChannelMetadata:
+    """Identity, device info and units of a channel, computed once and shared by its entities"""
+
+    def __init__(self, navilink, channel) -> None:
+        device_info = navilink.device_info.get("deviceInfo",{})
+        self.mac_address = device_info.get("macAddress","unknown")
+        self.device_name = device_info.get("deviceName","UNKNOWN")
+        self.channel_name = "CH" + str(channel.channel_number)
+        self.unique_id_prefix = self.mac_address + str(channel.channel_number)
+        self.device_info = DeviceInfo(
+            identifiers = {(DOMAIN, self.mac_address + "_" + str(channel.channel_number))},
+            manufacturer = "Navien",
+            name = device_info.get("deviceName","unknown") + " " + self.channel_name,
+        )
+        if channel.channel_info.get("temperatureType",2) == TemperatureType.FAHRENHEIT.value:
+            self.navien_units = "us_customary"
+            self.temperature_unit = UnitOfTemperature.FAHRENHEIT
+        else:
+            self.navien_units = "metric"
+            self.temperature_unit = UnitOfTemperature.CELSIUS
+
+_channel_metadata = weakref.WeakKeyDictionary()
+
+def channel_metadata(navilink, channel):
+    """Return the shared metadata of a channel, computing it for the first entity that asks"""
+    if (metadata := _channel_metadata.get(channel)) is None:
+        metadata = _channel_metadata[channel] = ChannelMetadata(navilink, channel)
+    return metadata
+
+class NavienEntity(Entity):
+    """
+    Base class for the entities of a NaviLink channel.
+
+    Name, unique ID and device info never change for a channel, so they are set once as entity
+    attributes instead of being rebuilt by properties on every state write.
+    """
+
+    # State is pushed on channel updates, polling would write it past the sensor throttling
+    _attr_should_poll = False
+
+    def __init__(self, navilink, channel, unique_id_suffix) -> None:
+        self.navilink = navilink
+        self.channel = channel
+        self.metadata = channel_metadata(navilink, channel)
+        self._attr_unique_id = self.metadata.unique_id_prefix + unique_id_suffix
+        self._attr_device_info = self.metadata.device_info
+
+    async def async_added_to_hass(self) -> None:
+        """Run when this Entity has been added to HA."""
+        self.channel.register_callback(self.update_state)
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Entity being removed from hass."""
+        self.channel.deregister_callback(self.update_state)
+
+    def update_state(self):
+        self.async_write_ha_state()
+
+    async def async_control(self, command):
+        """Await a channel command, reporting a rejection by the gateway as a Home Assistant error"""
+        try:
+            return await command
+        except ControlFailed as err:
+            raise HomeAssistantError(str(err)) from err
+
+    @property
+    def available(self):
+        """Return if the the device is online or not."""
+        return self.channel.is_available()
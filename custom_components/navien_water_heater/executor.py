@@ -0,0 +1,62 @@
+"""Shared executor for the blocking AWS IoT SDK calls of all NaviLink hubs."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Fixed number of worker threads shared by every hub, however many gateways are configured
+SDK_THREAD_BUDGET = 4
+
+class NavilinkExecutor(ThreadPoolExecutor):
+    """Thread pool that tracks how many jobs are waiting for a worker"""
+
+    def __init__(self, max_workers=SDK_THREAD_BUDGET) -> None:
+        super().__init__(max_workers=max_workers, thread_name_prefix="navien_sdk")
+        self.max_workers = max_workers
+        self.lock = threading.Lock()
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.submitted = 0
+
+    def submit(self, fn, /, *args, **kwargs):
+        with self.lock:
+            self.queue_depth += 1
+            self.submitted += 1
+            if self.queue_depth > self.max_queue_depth:
+                self.max_queue_depth = self.queue_depth
+
+        def job():
+            with self.lock:
+                self.queue_depth -= 1
+            return fn(*args, **kwargs)
+
+        return super().submit(job)
+
+    def stats(self):
+        return {
+            "max_workers": self.max_workers,
+            "threads": len(self._threads),
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "submitted": self.submitted,
+        }
+
+_lock = threading.Lock()
+_executor = None
+_users = 0
+
+def acquire_executor():
+    """Return the shared executor, creating it for the first hub that needs it"""
+    global _executor, _users
+    with _lock:
+        if _executor is None:
+            _executor = NavilinkExecutor()
+        _users += 1
+        return _executor
+
+def release_executor():
+    """Drop one hub's reference, the executor is shut down once no hub uses it"""
+    global _executor, _users
+    with _lock:
+        _users = max(0, _users - 1)
+        if _users == 0 and _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
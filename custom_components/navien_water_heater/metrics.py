@@ -0,0 +1,93 @@
+"""Runtime metrics for the Navien NaviLink hub."""
+from bisect import bisect_left
+from collections import defaultdict
+
+# Upper bounds in seconds, the last bucket catches everything above 60s
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Upper bounds for histograms of counts, e.g. messages per batch
+COUNT_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+class Histogram:
+    """Fixed bucket histogram with count, sum and max"""
+
+    __slots__ = ("buckets", "counts", "count", "sum", "max")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self):
+        if self.count:
+            return self.sum / self.count
+        return None
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.mean, 6) if self.count else None,
+            "max": round(self.max, 6),
+            "buckets": {("+Inf" if i == len(self.buckets) else str(self.buckets[i])): n for i, n in enumerate(self.counts) if n},
+        }
+
+class NavilinkMetrics:
+    """Counters and histograms keyed by metric name and an optional label.
+
+    Counters are plain dictionary increments so they are cheap enough to leave
+    on. Each metric should only be written from one thread (either the event
+    loop or the SDK callback thread) so increments are never lost.
+    """
+
+    def __init__(self) -> None:
+        self.counters = defaultdict(int)
+        self.histograms = {}
+
+    def inc(self, name, label="", value=1):
+        self.counters[(name, label)] += value
+
+    def observe(self, name, label, value, buckets=DEFAULT_BUCKETS):
+        if (histogram := self.histograms.get((name, label))) is None:
+            histogram = self.histograms[(name, label)] = Histogram(buckets)
+        histogram.observe(value)
+
+    def counter(self, name, label=None):
+        """Return a counter value, summed over all labels if label is None"""
+        if label is not None:
+            return self.counters.get((name, label), 0)
+        return sum(value for (key, _), value in list(self.counters.items()) if key == name)
+
+    def histogram(self, name, label=None):
+        """Return a histogram, merged over all labels if label is None"""
+        if label is not None:
+            return self.histograms.get((name, label))
+        merged = None
+        for (key, _), histogram in list(self.histograms.items()):
+            if key != name:
+                continue
+            if merged is None:
+                merged = Histogram(histogram.buckets)
+            merged.counts = [a + b for a, b in zip(merged.counts, histogram.counts)]
+            merged.count += histogram.count
+            merged.sum += histogram.sum
+            merged.max = max(merged.max, histogram.max)
+        return merged
+
+    def as_dict(self):
+        counters = {}
+        for (name, label), value in list(self.counters.items()):
+            counters.setdefault(name, {})[label or "total"] = value
+        histograms = {}
+        for (name, label), histogram in list(self.histograms.items()):
+            histograms.setdefault(name, {})[label or "total"] = histogram.as_dict()
+        return {"counters": counters, "histograms": histograms}
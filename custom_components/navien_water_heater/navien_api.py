@@ -1,25 +1,69 @@
 import asyncio
+import collections
 import enum
+import importlib
 import json
 import logging
+import threading
+import time
 import uuid
-from datetime import datetime,timedelta
-import AWSIoTPythonSDK.MQTTLib as mqtt
+from datetime import datetime,timezone
 import aiohttp
+from .capture import DIRECTION_OUT, TrafficCapture
+from .executor import acquire_executor, release_executor
+from .metrics import COUNT_BUCKETS, NavilinkMetrics
+from .ratelimit import get_rate_budget
+from .schedule import REFRESH_WINDOW, get_fleet_scheduler
+from .supervisor import TaskSupervisor
+from .telemetry import TelemetryExporter
+from .watchdog import LoopWatchdog
 
 _LOGGER = logging.getLogger(__name__)
 
+# Maximum number of queued inbound messages that are not coalesced in a mailbox
+INBOUND_QUEUE_SIZE = 256
+# Seconds between keep-alive polls of channels without any subscribed entity, 0 to stop polling them
+IDLE_POLL_INTERVAL = 900
+# Seconds between status requests probing an offline gateway for recovery
+GATEWAY_PROBE_INTERVAL = 300
+# controlFail codes reporting a temporary condition (gateway busy), commands rejected with them are retried.
+# Code 2 is the busy code of the NaviLink simulator (tools/navilink_simulator), it has not been confirmed
+# from a real gateway yet. Retries are bounded by CONTROL_RETRIES, so a wrong guess only delays the failure.
+RETRYABLE_FAIL_CODES = {2}
+CONTROL_RETRIES = 2
+CONTROL_RETRY_DELAY = 1
+# Unanswered requests after which the connection is considered dead and reconnected, 0 to disable
+LIVENESS_MISSED = 3
+# Seconds between liveness checks, and between probes while a request is unanswered
+LIVENESS_CHECK_INTERVAL = 5
+# A request is missed once unanswered for LIVENESS_RTT_FACTOR times the connection's RTT, at least LIVENESS_TIMEOUT seconds
+LIVENESS_TIMEOUT = 10
+LIVENESS_RTT_FACTOR = 4
+# Seconds without any inbound message after which a quiet connection is probed
+LIVENESS_PROBE_INTERVAL = 60
+# Topics only routed when a consumer enables them, or all with subscribe_all_topics
+OPTIONAL_TOPICS = ["weeklyschedule", "simpletrend", "hourlytrend", "dailytrend", "monthlytrend"]
+
 class NavilinkConnect():
 
     # The Navien server.
     navienWebServer = "https://nlus.naviensmartcontrol.com/api/v2"
 
-    def __init__(self, userId, passwd, device_index = 0, polling_interval = 15, aws_cert_path = "AmazonRootCA1.pem", subscribe_all_topics=False):
+    def __init__(self, userId, passwd, device_index = 0, polling_interval = 15, aws_cert_path = "AmazonRootCA1.pem", subscribe_all_topics=False, capture_path=None, web_server=None, mqtt_client_factory=None, telemetry_path=None, telemetry_format="ndjson", telemetry_fields=None, refresh_window=REFRESH_WINDOW, loop_watchdog=False, liveness_missed=LIVENESS_MISSED):
         """
         Construct a new 'NavilinkConnect' object.
 
         :param userId: The user ID used to log in to the mobile application
         :param passwd: The corresponding user's password
+        :param capture_path: Directory to record all MQTT traffic to, capture is disabled if None
+        :param web_server: Override of the Navien REST API base URL, e.g. to point at a local simulator
+        :param mqtt_client_factory: Callable taking the client ID and returning an AWSIoTMQTTClient compatible client
+        :param telemetry_path: Directory to stream every channel status update to, export is disabled if None
+        :param telemetry_format: "ndjson" or "csv"
+        :param telemetry_fields: Channel and unit fields to export, comma separated or a list, the defaults if empty
+        :param refresh_window: Seconds after 2 am over which the daily reconnects of all gateways are spread
+        :param loop_watchdog: Sample event loop lag and record slow handlers and callbacks with their stack
+        :param liveness_missed: Reconnect after this many requests went unanswered, 0 to only rely on the SDK
         :return: returns nothing
         """
         self.userId = userId
@@ -28,6 +72,8 @@ class NavilinkConnect():
         self.polling_interval = polling_interval
         self.aws_cert_path = aws_cert_path
         self.subscribe_all_topics = subscribe_all_topics
+        self.optional_topics = {}
+        self.routes = {}
         self.loop = asyncio.get_running_loop()
         self.connected = False
         self.shutting_down = False
@@ -43,9 +89,45 @@ class NavilinkConnect():
         self.response_events = {}
         self.client_lock = asyncio.Lock()
         self.last_poll = None
+        self.metrics = NavilinkMetrics()
+        self.callbacks = []
+        self.capture = TrafficCapture(capture_path) if capture_path else None
+        self.telemetry = TelemetryExporter(telemetry_path, telemetry_format, telemetry_fields) if telemetry_path else None
+        self.watchdog = LoopWatchdog(self.metrics) if loop_watchdog else None
+        if web_server:
+            self.navienWebServer = web_server
+        self.mqtt_client_factory = mqtt_client_factory
+        self.executor = None
+        self.inbound = collections.deque()
+        self.mailboxes = {}
+        self.inbound_lock = threading.Lock()
+        self.inbound_scheduled = False
+        self.rate_budget = get_rate_budget()
+        self.scheduler = get_fleet_scheduler()
+        self.refresh_window = refresh_window
+        self.gateway_online = True
+        self.gateway_status_changed = None
+        self.last_probe = None
+        self.control_failures = {}
+        self.last_session_id = 0
+        self.supervisor = TaskSupervisor()
+        self.liveness_missed = liveness_missed
+        self.schedule_changed = asyncio.Event()
+        self.unanswered = collections.deque(maxlen=64)
+        self.last_message = self.loop.time()
+        self.rtt = None
+        if subscribe_all_topics:
+            for name in OPTIONAL_TOPICS:
+                self.enable_topic(name)
 
     async def start(self):
         if self.polling_interval > 0:
+            if self.capture:
+                await self._run_in_executor("capture_start",self.capture.start)
+            if self.telemetry:
+                await self._run_in_executor("telemetry_start",self.telemetry.start)
+            if self.watchdog:
+                self.watchdog.start(self.loop)
             valid_user = True
             while not self.connected and valid_user and not self.shutting_down:
                 try:
@@ -57,42 +139,82 @@ class NavilinkConnect():
                     _LOGGER.error("Connection error during start up: " +str(e))
                     await asyncio.sleep(15)
                 else:
-                    asyncio.create_task(self._start())
-                    if len(self.channels) > 0:
-                        return self.channels
-                    else:
+                    if len(self.channels) == 0:
+                        # Close the session and stop the capture, telemetry and watchdog threads started above
+                        await self.disconnect()
                         raise NoNavienDevices("No Navien devices found with the given credentials")
+                    self.supervisor.spawn(self._supervise(), name = "Supervise Connection")
+                    return self.channels
         else:
             return await self.login()
 
+    async def _supervise(self):
+        """
+        Run the connection's tasks and reconnect whenever they reset, until the hub shuts down
+
+        The delay before reconnecting grows while connections keep failing quickly, and state
+        left over from the reset connection is cleared before the next one is made.
+        """
+        while not self.shutting_down:
+            started = self.loop.time()
+            await self._start()
+            if self.shutting_down:
+                return
+            self.connected = False
+            delay = self.supervisor.next_delay(self.loop.time() - started)
+            _LOGGER.warning("Connection to AWS IOT Navilink server reset, reconnecting in " + str(delay) + " seconds")
+            await asyncio.sleep(delay)
+            self._clear_stale_state()
+            while not self.connected and not self.shutting_down:
+                try:
+                    await self.login()
+                except UserNotFound as err:
+                    _LOGGER.error(err)
+                    return
+                except Exception as e:
+                    _LOGGER.error("Connection error during reconnect: " + str(e))
+                    await asyncio.sleep(self.supervisor.next_delay(0))
+
     async def _start(self):
         if not self.shutting_down:
             tasks = [
-                asyncio.create_task(self._poll_mqtt_server(), name = "Poll MQTT Server"),
-                asyncio.create_task(self._server_connection_lost(), name = "Connection Lost Event"),
-                asyncio.create_task(self._refresh_connection(), name = "Reresh Connection")
+                self.supervisor.spawn(self._poll_mqtt_server(), name = "Poll MQTT Server"),
+                self.supervisor.spawn(self._server_connection_lost(), name = "Connection Lost Event"),
+                self.supervisor.spawn(self._refresh_connection(), name = "Reresh Connection"),
+                self.supervisor.spawn(self._monitor_liveness(), name = "Monitor Liveness")
             ]
-            done, pending = await asyncio.wait(tasks,return_when=asyncio.FIRST_EXCEPTION)
+            try:
+                done, pending = await asyncio.wait(tasks,return_when=asyncio.FIRST_EXCEPTION)
+            finally:
+                for task in tasks:
+                    task.cancel()
             for task in done:
                 name = task.get_name()
                 try:
                     task.result()
                 except Exception as e:
                     _LOGGER.error(name + ": " + str(type(e).__name__) + ": " + str(e))
-            for task in pending:
-                task.cancel()     
-            if not self.shutting_down:
-                _LOGGER.warning("Connection to AWS IOT Navilink server reset, reconnecting in 15 seconds")
-                self.connected = False
-                await asyncio.sleep(15)
-                asyncio.create_task(self.start())
+                    self.metrics.inc("reconnects", type(e).__name__)
+                else:
+                    self.metrics.inc("reconnects", name)
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def _clear_stale_state(self):
+        # Requests of the reset connection will never be answered, their waiters pop them without failing
+        self.response_events.clear()
+        self.control_failures.clear()
+        self.disconnect_event.clear()
+        # Liveness is tracked per connection
+        self.unanswered.clear()
+        self.last_message = self.loop.time()
+        self.rtt = None
 
     async def login(self):
         """
         Login to the REST API and save user information
         """
         async with aiohttp.ClientSession() as session:
-            async with session.post(NavilinkConnect.navienWebServer + "/user/sign-in", json={"userId": self.userId, "password": self.passwd}) as response:
+            async with session.post(self.navienWebServer + "/user/sign-in", json={"userId": self.userId, "password": self.passwd}) as response:
                 # If an error occurs this will raise it, otherwise it calls get_device and returns after device is obtained from the server
                 if response.status != 200:
                     raise UnableToConnect("Unexpected response during login")
@@ -113,7 +235,7 @@ class NavilinkConnect():
         """
         headers = {"Authorization":self.user_info.get("token",{}).get("accessToken","")}
         async with aiohttp.ClientSession(headers=headers) as session:
-            async with session.post(NavilinkConnect.navienWebServer + "/device/list", json={"offset":0,"count":20,"userId":self.userId}) as response:
+            async with session.post(self.navienWebServer + "/device/list", json={"offset":0,"count":20,"userId":self.userId}) as response:
                 # If an error occurs this will raise it, otherwise it returns the gateway list.
                 if response.status != 200:
                     raise UnableToConnect("Unexpected response while retrieving device list")
@@ -138,16 +260,21 @@ class NavilinkConnect():
         sessionToken = self.user_info.get("token",{}).get("sessionToken",None)
 
         if accessKeyId and secretKey and sessionToken:
-            self.client = mqtt.AWSIoTMQTTClient(clientID = self.client_id, protocolType=4, useWebsocket=True, cleanSession=True)
+            if self.mqtt_client_factory:
+                self.client = self.mqtt_client_factory(self.client_id)
+            else:
+                # The SDK is only imported once an MQTT connection is made, so config flows and REST only logins never load it
+                mqtt = await self._run_in_executor("import_sdk",importlib.import_module,"AWSIoTPythonSDK.MQTTLib")
+                self.client = mqtt.AWSIoTMQTTClient(clientID = self.client_id, protocolType=4, useWebsocket=True, cleanSession=True)
             self.client.configureEndpoint(hostName= 'a1t30mldyslmuq-ats.iot.us-east-1.amazonaws.com', portNumber= 443)
             self.client.configureUsernamePassword(username='?SDK=Android&Version=2.16.12', password=None)
             self.client.configureLastWill(topic = self.topics.app_connection(), payload = json.dumps(self.messages.last_will(),separators=(',',':')), QoS=1, retain=False)
-            await self.loop.run_in_executor(None,self.client.configureCredentials,self.aws_cert_path)
+            await self._run_in_executor("configure_credentials",self.client.configureCredentials,self.aws_cert_path)
             self.client.configureIAMCredentials(AWSAccessKeyID=accessKeyId, AWSSecretAccessKey=secretKey, AWSSessionToken=sessionToken)
             self.client.configureConnectDisconnectTimeout(5)
             self.client.onOffline=self._on_offline
             self.client.onOnline=self._on_online
-            await self.loop.run_in_executor(None,self.client.connect)
+            await self._run_in_executor("connect",self.client.connect)
             await self._subscribe_to_topics()
             if not len(self.channels):
                 await self._get_channel_info()
@@ -156,19 +283,24 @@ class NavilinkConnect():
         else:
             raise NoAccessKey("Missing Access key, Secret key, or Session token")
 
+    @property
+    def schedule_key(self):
+        """Key identifying this hub's gateway to the fleet scheduler"""
+        return (self.device_info or {}).get("deviceInfo",{}).get("macAddress","") or self.userId + "/" + str(self.device_index)
+
     async def _poll_mqtt_server(self):
-        time_delta = 0
         while self.connected and not self.shutting_down:
-            if time_delta < self.polling_interval:
-                interval = self.polling_interval - time_delta
-            else:
-                interval = 0.1
-            await asyncio.sleep(interval)
+            # Polls start in this hub's slot of the fleet schedule, so hubs with the same interval take turns
+            self.scheduler.register(self.schedule_key, self.polling_interval)
+            if await self._wait_unless_rescheduled(self.scheduler.poll_delay(self.schedule_key, self.polling_interval, self.loop.time())):
+                continue
             pre_poll = datetime.now()
             if not self.client_lock.locked():
                 await self._get_channel_status_all()
             self.last_poll = datetime.now()
             time_delta = (self.last_poll - pre_poll).total_seconds()
+            self.metrics.observe("poll_cycle_duration", "", time_delta)
+            self.publish_update()
         if not self.shutting_down:
             raise PollingError("Polling of AWS IOT Navilink server completed")
 
@@ -177,20 +309,182 @@ class NavilinkConnect():
         self.disconnect_event.clear()
         raise DisconnectEvent("Disconnected from Navilink server...")
 
+    async def _monitor_liveness(self):
+        """
+        Reconnect when the connection stopped answering, even though the SDK still reports it online
+
+        Any inbound message proves the connection alive. Requests sent since the last one count
+        as missed once they are overdue, see response_timeout. A quiet connection, or one with a
+        missed request, is probed with a status request so a half-open connection is detected
+        without waiting for the next poll. A quiet connection without subscribed channels is only
+        probed when a keep-alive poll is due, which the probe then stands in for. An offline gateway
+        never answers, so requests to it do not count.
+        """
+        while self.connected and not self.shutting_down:
+            await asyncio.sleep(LIVENESS_CHECK_INTERVAL)
+            if not self.liveness_missed:
+                continue
+            now = self.loop.time()
+            missed = self.missed_responses(now)
+            if missed >= self.liveness_missed:
+                self.metrics.inc("liveness_timeouts")
+                try:
+                    await self.disconnect(shutting_down=False)
+                except Exception as e:
+                    _LOGGER.debug("Error while disconnecting a dead connection: " + str(e))
+                raise LivenessTimeout(str(missed) + " requests unanswered, last message received " + str(round(now - self.last_message)) + " seconds ago")
+            if self.gateway_online and self.channels and (missed or now - self.last_message >= max(LIVENESS_PROBE_INTERVAL, self.polling_interval + LIVENESS_CHECK_INTERVAL)):
+                channel = next((channel for channel in self.channels.values() if missed or channel.poll_due(now)), None)
+                if channel is None:
+                    continue
+                channel.last_status_request = now
+                self.metrics.inc("liveness_probes")
+                await self.async_publish(topic=self.topics.channel_status_req(),payload=self.messages.channel_status(channel.channel_number,channel.channel_info.get("unitCount",1)))
+
+    def response_timeout(self):
+        """Seconds after which an unanswered request counts as missed"""
+        return max(LIVENESS_TIMEOUT, LIVENESS_RTT_FACTOR * self.rtt) if self.rtt else LIVENESS_TIMEOUT
+
+    def missed_responses(self, now):
+        timeout = self.response_timeout()
+        return sum(1 for sent in self.unanswered if now - sent > timeout)
+
+    def liveness(self):
+        now = self.loop.time()
+        return {
+            "rtt": round(self.rtt, 3) if self.rtt else None,
+            "response_timeout": round(self.response_timeout(), 1),
+            "unanswered": len(self.unanswered),
+            "missed": self.missed_responses(now),
+            "last_message_age": round(now - self.last_message, 1),
+            "missed_to_reconnect": self.liveness_missed,
+        }
+
     async def _refresh_connection(self):
-        now = datetime.now()
-        target_time = datetime(now.year, now.month, now.day, 2, 0, 0)
-        if now > target_time:
-            # If it's already past 2 am, wait until tomorrow
-            target_time += timedelta(days=1)
-        delta = (target_time - now).total_seconds()
-        await asyncio.sleep(delta)
+        while True:
+            now = datetime.now()
+            # Every gateway reconnects at its own fixed offset into the refresh window after 2 am
+            target_time = self.scheduler.next_refresh(self.schedule_key, now, self.refresh_window)
+            delta = (target_time - now).total_seconds()
+            if not await self._wait_unless_rescheduled(delta):
+                break
         await self.disconnect(shutting_down=False)
 
+    async def _wait_unless_rescheduled(self, delay):
+        """Sleep for delay seconds, returning True early if apply_options changed the schedule"""
+        try:
+            await asyncio.wait_for(self.schedule_changed.wait(), delay)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def apply_options(self, polling_interval=None, refresh_window=None, liveness_missed=None, subscribe_all_topics=None):
+        """
+        Change settings of the running hub without reconnecting, None keeps a setting
+
+        A waiting poll and the daily reconnect are rescheduled at once for a new polling interval
+        or refresh window, and the optional topics are routed or dropped with subscribe_all_topics.
+        """
+        rescheduled = False
+        if polling_interval is not None and polling_interval != self.polling_interval:
+            self.polling_interval = polling_interval
+            rescheduled = True
+        if refresh_window is not None and refresh_window != self.refresh_window:
+            self.refresh_window = refresh_window
+            rescheduled = True
+        if liveness_missed is not None:
+            self.liveness_missed = liveness_missed
+        if subscribe_all_topics is not None and subscribe_all_topics != self.subscribe_all_topics:
+            self.subscribe_all_topics = subscribe_all_topics
+            for name in OPTIONAL_TOPICS:
+                if subscribe_all_topics:
+                    self.enable_topic(name)
+                else:
+                    self.disable_topic(name)
+        if rescheduled:
+            # Wakes the tasks waiting right now, set and clear so later waits sleep normally
+            self.schedule_changed.set()
+            self.schedule_changed.clear()
+
     async def disconnect(self,shutting_down=True):
+        if shutting_down:
+            self.shutting_down = True
         if self.client and self.connected:
-            self.shutting_down = shutting_down
-            await self.loop.run_in_executor(None,self.client.disconnect)
+            await self._run_in_executor("disconnect",self.client.disconnect)
+        if shutting_down:
+            # Cancel and wait for every task of the hub, then drop what they were waiting for
+            await self.supervisor.close()
+            self._clear_stale_state()
+        if shutting_down and self.capture:
+            await self._run_in_executor("capture_stop",self.capture.stop)
+        if shutting_down and self.telemetry:
+            await self._run_in_executor("telemetry_stop",self.telemetry.stop)
+        if shutting_down and self.watchdog:
+            await self._run_in_executor("watchdog_stop",self.watchdog.stop)
+        if shutting_down:
+            self.scheduler.unregister(self.schedule_key)
+        if shutting_down and self.executor:
+            self.executor = None
+            release_executor()
+
+    async def _run_in_executor(self,name,func,*args):
+        """
+        Run a blocking SDK call in the executor shared by all hubs and record how long it waited for a worker
+
+        The shared executor keeps slow broker I/O off Home Assistant's default executor and bounds
+        the number of SDK worker threads however many hubs are running.
+        """
+        if self.executor is None:
+            self.executor = acquire_executor()
+        submitted = time.monotonic()
+        waited = None
+
+        def job():
+            nonlocal waited
+            waited = time.monotonic() - submitted
+            return func(*args)
+
+        try:
+            return await self.loop.run_in_executor(self.executor,job)
+        finally:
+            # Observed on the event loop, the executor's workers run jobs of several hubs at the same time
+            if waited is not None:
+                self.metrics.observe("executor_wait", name, waited)
+
+    def register_callback(self,callback):
+        self.callbacks.append(callback)
+
+    def deregister_callback(self,callback):
+        if callback in self.callbacks:
+            self.callbacks.remove(callback)
+
+    def publish_update(self):
+        if self.watchdog:
+            with self.watchdog.timed("publish_update", "hub"):
+                for callback in self.callbacks:
+                    callback()
+        else:
+            for callback in self.callbacks:
+                callback()
+        self.metrics.inc("callbacks_dispatched", "hub", len(self.callbacks))
+
+    def set_gateway_online(self,online):
+        """Record the gateway's connection state reported by the Navien cloud and refresh availability"""
+        if online == self.gateway_online:
+            return
+        self.gateway_online = online
+        self.gateway_status_changed = datetime.now()
+        self.last_probe = None
+        self.unanswered.clear()
+        if online:
+            _LOGGER.info("Navien gateway is online again")
+            self.metrics.inc("gateway_online")
+        else:
+            _LOGGER.warning("Navien gateway is offline, polling is suspended until it reconnects")
+            self.metrics.inc("gateway_offline")
+        for channel in self.channels.values():
+            channel.publish_update()
+        self.publish_update()
 
     def _on_online(self):
         self.connected = True
@@ -201,57 +495,125 @@ class NavilinkConnect():
 
     async def async_subscribe(self,topic,QoS=1,callback=None):
         try:
+            if self.capture and callback:
+                callback = self.capture.wrap(callback)
+
             def subscribe():
                 self.client.subscribe(topic=topic,QoS=QoS,callback=callback)
 
             async with self.client_lock:
-                await self.loop.run_in_executor(None,subscribe)
+                await self._run_in_executor("subscribe",subscribe)
         except Exception as e:
             _LOGGER.debug("Error occurred in async_subscribe: " + str(e))
             await self.disconnect(shutting_down=False)           
 
-    async def async_publish(self,topic,payload,QoS=1,session_id=""):
+    async def async_publish(self,topic,payload,QoS=1,session_id="",deferrable=False):
+        """
+        Publish a request, waiting for its response if a response event is registered for session_id
+
+        Every request takes a token from the rate budget shared by all hubs. Deferrable requests
+        (polls) wait for a token, the others are always sent right away. Returns False if the
+        request failed or its response timed out.
+        """
+        message_type = topic_label(topic)
         try:
+            if waited := await self.rate_budget.acquire(self.userId,deferrable):
+                self.metrics.inc("rate_deferred", message_type)
+                self.metrics.observe("rate_wait", message_type, waited)
             def publish():
-                self.client.publish(topic=topic,payload=json.dumps(payload,separators=(',',':')),QoS=QoS)
+                message = json.dumps(payload,separators=(',',':'))
+                if self.capture:
+                    self.capture.record(DIRECTION_OUT,topic,message,payload.get("sessionID",""))
+                self.client.publish(topic=topic,payload=message,QoS=QoS)
                                 
+            sent = time.monotonic()
             async with self.client_lock:
-                await self.loop.run_in_executor(None,publish)
+                await self._run_in_executor("publish",publish)
+            self.metrics.inc("requests_sent", message_type)
+            if self.gateway_online:
+                self.unanswered.append(self.loop.time())
 
             if response_event :=  self.response_events.get(session_id,None):
+                answered = False
                 try:
                     await asyncio.wait_for(response_event.wait(),timeout=self.polling_interval)
-                except:
-                    pass
-                response_event.clear()
-                self.response_events.pop(session_id)
+                except asyncio.TimeoutError:
+                    self.metrics.inc("request_timeouts", message_type)
+                else:
+                    answered = True
+                    self.metrics.observe("request_rtt", message_type, time.monotonic() - sent)
+                finally:
+                    # Also runs when the request's task is cancelled, so no event is left behind
+                    response_event.clear()
+                    self.response_events.pop(session_id,None)
+                return answered
+            return True
         except Exception as e:
             _LOGGER.debug("Error occurred in async_publish: " + str(e))
             if response_event :=  self.response_events.get(session_id,None):
                 response_event.clear()
-                self.response_events.pop(session_id)
+                self.response_events.pop(session_id,None)
             await self.disconnect(shutting_down=False)   
+            return False
 
 
     async def _subscribe_to_topics(self):
-        await self.async_subscribe(topic=self.topics.channel_info_sub(),callback=self.handle_other)
-        await self.async_subscribe(topic=self.topics.channel_info_res(),callback=self.handle_channel_info)
-        await self.async_subscribe(topic=self.topics.control_fail(),callback=self.handle_other)
-        await self.async_subscribe(topic=self.topics.channel_status_sub(),callback=self.handle_other)
-        await self.async_subscribe(topic=self.topics.channel_status_res(),callback=self.handle_channel_status)
-        await self.async_subscribe(topic=self.topics.connection(),callback=self.handle_other)
-        await self.async_subscribe(topic=self.topics.disconnect(),callback=self.handle_other)
-        if self.subscribe_all_topics:
-            await self.async_subscribe(topic=self.topics.weekly_schedule_sub(),callback=self.handle_other)
-            await self.async_subscribe(topic=self.topics.weekly_schedule_res(),callback=self.handle_weekly_schedule)
-            await self.async_subscribe(topic=self.topics.simple_trend_sub(),callback=self.handle_other)
-            await self.async_subscribe(topic=self.topics.simple_trend_res(),callback=self.handle_simple_trend)
-            await self.async_subscribe(topic=self.topics.hourly_trend_sub(),callback=self.handle_other)
-            await self.async_subscribe(topic=self.topics.hourly_trend_res(),callback=self.handle_hourly_trend)
-            await self.async_subscribe(topic=self.topics.daily_trend_sub(),callback=self.handle_other)
-            await self.async_subscribe(topic=self.topics.daily_trend_res(),callback=self.handle_daily_trend)
-            await self.async_subscribe(topic=self.topics.monthly_trend_sub(),callback=self.handle_other)
-            await self.async_subscribe(topic=self.topics.monthly_trend_res(),callback=self.handle_monthly_trend)
+        """
+        Subscribe to the client's response prefix and the gateway's broadcast prefix with one wildcard each
+
+        Messages on them are dispatched by _route through the routing table of this connection,
+        so optional topics only need a route and never a subscription of their own.
+        """
+        self._build_routes()
+        await self.async_subscribe(topic=self.topics.res_all(),callback=self._route)
+        await self.async_subscribe(topic=self.topics.sub_all(),callback=self._route)
+        await self.async_subscribe(topic=self.topics.connection(),callback=self.handle_connection)
+        await self.async_subscribe(topic=self.topics.disconnect(),callback=self.handle_disconnect_event)
+
+    def _build_routes(self):
+        # Replaced as a whole, the SDK thread always sees a complete table
+        routes = {
+            self.topics.channel_info_sub(): self.handle_other,
+            self.topics.channel_info_res(): self.handle_channel_info,
+            self.topics.control_fail(): self.handle_control_fail,
+            self.topics.channel_status_sub(): self.handle_other,
+            self.topics.channel_status_res(): self.handle_channel_status,
+        }
+        for name, callback in self.optional_topics.items():
+            routes[self.topics.sub(name)] = self.handle_other
+            routes[self.topics.res + name] = callback
+        self.routes = routes
+
+    def _route(self, client, userdata, message):
+        # Runs on the SDK callback thread for every message on the wildcard subscriptions
+        if handler := self.routes.get(message.topic):
+            handler(client, userdata, message)
+        else:
+            self.metrics.inc("messages_unrouted", topic_label(message.topic))
+
+    def enable_topic(self, name, callback=None):
+        """
+        Handle an optional topic such as "hourlytrend", see OPTIONAL_TOPICS
+
+        The responses are passed to callback on the SDK callback thread, by default they are
+        logged. The wildcard subscriptions already cover the topic, so it takes effect at once.
+        """
+        handlers = {
+            "weeklyschedule": self.handle_weekly_schedule,
+            "simpletrend": self.handle_simple_trend,
+            "hourlytrend": self.handle_hourly_trend,
+            "dailytrend": self.handle_daily_trend,
+            "monthlytrend": self.handle_monthly_trend,
+        }
+        if name not in handlers:
+            raise ValueError("Unknown optional topic: " + str(name))
+        self.optional_topics[name] = callback or handlers[name]
+        if self.topics:
+            self._build_routes()
+
+    def disable_topic(self, name):
+        if self.optional_topics.pop(name, None) and self.topics:
+            self._build_routes()
 
     async def _get_channel_info(self):
         topic = self.topics.start()
@@ -263,8 +625,28 @@ class NavilinkConnect():
         if len(self.channels) == 0:
             raise NoChannelInformation("Unable to get channel information")
 
-    async def _get_channel_status_all(self,wait_for_response=False):
-        for channel in self.channels.values():
+    async def _get_channel_status_all(self,wait_for_response=False,channels=None):
+        """
+        Request the status of every channel, or of the given channels
+
+        Regular polls skip channels that no entity is subscribed to, apart from a keep-alive poll
+        every IDLE_POLL_INTERVAL seconds. Waiting for the responses polls every channel.
+        """
+        now = self.loop.time()
+        probe = not self.gateway_online and not wait_for_response
+        if probe:
+            # An offline gateway never answers, only probe one channel now and then for recovery
+            if self.last_probe is not None and now - self.last_probe < GATEWAY_PROBE_INTERVAL:
+                self.metrics.inc("polls_suspended")
+                return
+            self.last_probe = now
+            channels = list(self.channels.values())[:1]
+        for channel in channels or list(self.channels.values()):
+            # The recovery probe is sent whether or not the channel has subscribers
+            if not wait_for_response and not probe and not channel.poll_due(now):
+                self.metrics.inc("polls_skipped", str(channel.channel_number))
+                continue
+            channel.last_status_request = now
             topic = self.topics.channel_status_req()
             payload = self.messages.channel_status(channel.channel_number,channel.channel_info.get("unitCount",1))
             session_id = self.get_session_id()
@@ -273,7 +655,7 @@ class NavilinkConnect():
                 self.response_events[session_id] = asyncio.Event()
             else:
                 session_id = ""
-            await self.async_publish(topic=topic,payload=payload,session_id=session_id)
+            await self.async_publish(topic=topic,payload=payload,session_id=session_id,deferrable=True)
 
     async def _get_channel_status(self,channel_number):
         channel = self.channels.get(channel_number,{})
@@ -288,40 +670,47 @@ class NavilinkConnect():
         state_num = 2
         if state:
             state_num = 1
-        topic = self.topics.control()
-        payload = self.messages.power(state_num, channel_number)
-        session_id = self.get_session_id()
-        payload["sessionID"] = session_id
-        self.response_events[session_id] = asyncio.Event()
-        await self.async_publish(topic=topic,payload=payload,session_id=session_id)
-        await self._get_channel_status(channel_number)
+        return await self._send_command(self.messages.power(state_num, channel_number),channel_number)
 
     async def _hot_button_command(self,state,channel_number):
         state_num = 2
         if state:
             state_num = 1
-        topic = self.topics.control()
-        payload = self.messages.hot_button(state_num, channel_number)
-        session_id = self.get_session_id()
-        payload["sessionID"] = session_id
-        self.response_events[session_id] = asyncio.Event()
-        await self.async_publish(topic=topic,payload=payload,session_id=session_id)
-        await self._get_channel_status(channel_number)
+        return await self._send_command(self.messages.hot_button(state_num, channel_number),channel_number)
 
     async def _temperature_command(self,temp,channel_number):
+        return await self._send_command(self.messages.temperature(temp, channel_number),channel_number)
+
+    async def _send_command(self,payload,channel_number):
+        """
+        Publish a control command and request the channel's status once it was answered
+
+        A controlFail response for the command's session fails it right away with ControlFailed.
+        Failures with a RETRYABLE_FAIL_CODES code are retried up to CONTROL_RETRIES times under a
+        new session ID, which is safe as every command sets an absolute value.
+        """
         topic = self.topics.control()
-        payload = self.messages.temperature(temp, channel_number)
-        session_id = self.get_session_id()
-        payload["sessionID"] = session_id
-        self.response_events[session_id] = asyncio.Event()
-        await self.async_publish(topic=topic,payload=payload,session_id=session_id)
+        for attempt in range(CONTROL_RETRIES + 1):
+            session_id = self.get_session_id()
+            payload["sessionID"] = session_id
+            self.response_events[session_id] = asyncio.Event()
+            acknowledged = await self.async_publish(topic=topic,payload=payload,session_id=session_id)
+            if (failure := self.control_failures.pop(session_id,None)) is None:
+                break
+            if failure.fail_code not in RETRYABLE_FAIL_CODES or attempt == CONTROL_RETRIES:
+                raise failure
+            self.metrics.inc("control_retries", failure.mode)
+            await asyncio.sleep(CONTROL_RETRY_DELAY)
         await self._get_channel_status(channel_number)
+        return acknowledged
 
     def get_session_id(self):
-        return str(int(round((datetime.utcnow() - datetime(1970, 1, 1)).total_seconds()*1000)))
+        # Milliseconds since the epoch, bumped when needed so concurrent requests never share a session
+        session_id = int(round((datetime.utcnow() - datetime(1970, 1, 1)).total_seconds()*1000))
+        self.last_session_id = max(session_id, self.last_session_id + 1)
+        return str(self.last_session_id)
 
-    def async_handle_channel_info(self, client, userdata, message):
-        response = json.loads(message.payload)
+    def async_handle_channel_info(self, response):
         channel_info = response.get("response",{})
         session_id = response.get("sessionID","unknown")
         self.channels = {channel.get("channelNumber",0):NavilinkChannel(channel.get("channelNumber",0),channel.get("channel",{}),self) for channel in channel_info.get("channelInfo",{}).get("channelList",[])}
@@ -329,36 +718,165 @@ class NavilinkConnect():
             response_event.set()
 
     def handle_channel_info(self, client, userdata, message):
-        self.loop.call_soon_threadsafe(self.async_handle_channel_info, client, userdata, message)
+        self.metrics.inc("messages_received", topic_label(message.topic))
+        if response := self._decode(message):
+            self._deliver(self.async_handle_channel_info, response)
 
-    def async_handle_channel_status(self, client, userdata, message):
-        response = json.loads(message.payload)
+    def async_handle_channel_status(self, response):
         channel_status = response.get("response",{}).get("channelStatus",{})
         session_id = response.get("sessionID","unknown")
+        # Only a connected gateway answers, so a status response also means it is back online
+        self.set_gateway_online(True)
         if channel := self.channels.get(channel_status.get("channelNumber",0),None):
             channel.update_channel_status(channel_status.get("channel",{}))
         if response_event := self.response_events.get(session_id,None):
             response_event.set()
 
     def handle_channel_status(self, client, userdata, message):
-        self.loop.call_soon_threadsafe(self.async_handle_channel_status, client, userdata, message)
+        self.metrics.inc("messages_received", topic_label(message.topic))
+        if response := self._decode(message):
+            channel_number = response.get("response",{}).get("channelStatus",{}).get("channelNumber",0)
+            self._deliver_latest(("channelstatus",channel_number), self.async_handle_channel_status, response)
+
+    def async_handle_control_fail(self, response):
+        control_fail = response.get("response",{}).get("controlFail",{})
+        session_id = response.get("sessionID","unknown")
+        failure = ControlFailed(control_fail.get("channelNumber",0), control_fail.get("mode",""), control_fail.get("failCode",None))
+        self.metrics.inc("control_failures", failure.mode)
+        if response_event := self.response_events.get(session_id,None):
+            self.control_failures[session_id] = failure
+            response_event.set()
+        else:
+            _LOGGER.warning(str(failure))
+
+    def handle_control_fail(self, client, userdata, message):
+        self.metrics.inc("messages_received", topic_label(message.topic))
+        if response := self._decode(message):
+            self._deliver(self.async_handle_control_fail, response)
+
+    def async_handle_connection(self, response):
+        status = response.get("event",{}).get("connection",{}).get("status",None)
+        if status is not None:
+            self.set_gateway_online(status == 1)
+
+    def handle_connection(self, client, userdata, message):
+        self.metrics.inc("messages_received", topic_label(message.topic))
+        if response := self._decode(message):
+            self._deliver_latest(("connection",0), self.async_handle_connection, response)
+
+    def async_handle_disconnect_event(self, response):
+        # The topic is shared by all gateways, only act on events naming this one
+        mac_address = response.get("event",{}).get("macAddress",None) or response.get("macAddress",None)
+        if mac_address and mac_address == self.topics.mac_address:
+            self.set_gateway_online(False)
+
+    def handle_disconnect_event(self, client, userdata, message):
+        self.metrics.inc("messages_received", topic_label(message.topic))
+        if response := self._decode(message):
+            self._deliver(self.async_handle_disconnect_event, response)
+
+    def _decode(self, message):
+        """Decode a message payload on the SDK callback thread, keeping json.loads off the event loop"""
+        try:
+            return json.loads(message.payload)
+        except ValueError as e:
+            self.metrics.inc("inbound_decode_errors", topic_label(message.topic))
+            _LOGGER.debug("Unable to decode message on " + topic_label(message.topic) + ": " + str(e))
+
+    def _deliver(self, handler, response):
+        """
+        Queue a decoded message from the SDK callback thread for the event loop
+
+        The queue is bounded, when the loop falls behind the oldest message is dropped and counted.
+        """
+        with self.inbound_lock:
+            if len(self.inbound) >= INBOUND_QUEUE_SIZE:
+                self.inbound.popleft()
+                self.metrics.inc("inbound_dropped", handler.__name__)
+            self.inbound.append((handler, response))
+            self._schedule_drain()
+
+    def _deliver_latest(self, key, handler, response):
+        """
+        Put a decoded message in the latest-wins mailbox for key, e.g. one per channel and message type
+
+        If the loop has not processed the previous message for the same key yet, it is replaced
+        so stale intermediate states are never converted or dispatched. The session IDs of
+        replaced messages are kept so their waiting requests still complete.
+        """
+        session_id = response.get("sessionID","")
+        with self.inbound_lock:
+            if previous := self.mailboxes.get(key):
+                session_ids = previous[2]
+                self.metrics.inc("inbound_coalesced", key[0])
+            else:
+                session_ids = []
+            if session_id in self.response_events:
+                session_ids.append(session_id)
+            self.mailboxes[key] = (handler, response, session_ids)
+            self._schedule_drain()
+
+    def _schedule_drain(self):
+        # Only the first message of a batch wakes the loop, later ones ride along with it
+        if not self.inbound_scheduled:
+            self.inbound_scheduled = True
+            self.loop.call_soon_threadsafe(self._drain_inbound)
+
+    def _drain_inbound(self):
+        with self.inbound_lock:
+            self.inbound_scheduled = False
+            queued, self.inbound = self.inbound, collections.deque()
+            mailboxes, self.mailboxes = self.mailboxes, {}
+        # Any message proves the connection alive, the oldest unanswered request gives an RTT sample
+        now = self.loop.time()
+        if self.unanswered:
+            rtt = now - self.unanswered[0]
+            self.rtt = rtt if self.rtt is None else 0.8 * self.rtt + 0.2 * rtt
+            self.unanswered.clear()
+        self.last_message = now
+        for handler, response in queued:
+            self._handle(handler, response)
+        for handler, response, session_ids in mailboxes.values():
+            self._handle(handler, response)
+            for session_id in session_ids:
+                if response_event := self.response_events.get(session_id,None):
+                    response_event.set()
+        self.metrics.inc("loop_wakeups")
+        if batch_size := len(queued) + len(mailboxes):
+            self.metrics.observe("inbound_batch_size", "", batch_size, COUNT_BUCKETS)
+
+    def _handle(self, handler, response):
+        try:
+            if self.watchdog:
+                with self.watchdog.timed(handler.__name__, handler.__name__.replace("async_handle_","")):
+                    handler(response)
+            else:
+                handler(response)
+        except Exception as e:
+            _LOGGER.error("Error in " + handler.__name__ + ": " + str(type(e).__name__) + ": " + str(e))
 
     def handle_weekly_schedule(self, client, userdata, message):
+        self.metrics.inc("messages_received", topic_label(message.topic))
         _LOGGER.info("WEEKLY SCHEDULE: " + message.payload.decode('utf-8') + '\n')
 
     def handle_simple_trend(self, client, userdata, message):
+        self.metrics.inc("messages_received", topic_label(message.topic))
         _LOGGER.info("SIMPLE TREND: " + message.payload.decode('utf-8') + '\n')
 
     def handle_hourly_trend(self, client, userdata, message):
+        self.metrics.inc("messages_received", topic_label(message.topic))
         _LOGGER.info("HOURLY TREND: " + message.payload.decode('utf-8') + '\n')
 
     def handle_daily_trend(self, client, userdata, message):
+        self.metrics.inc("messages_received", topic_label(message.topic))
         _LOGGER.info("DAILY TREND: " + message.payload.decode('utf-8') + '\n')
 
     def handle_monthly_trend(self, client, userdata, message):
+        self.metrics.inc("messages_received", topic_label(message.topic))
         _LOGGER.info("MONTHLY TREND: " + message.payload.decode('utf-8') + '\n')
 
     def handle_other(self, client, userdata, message):
+        self.metrics.inc("messages_received", topic_label(message.topic))
         _LOGGER.info(message.payload.decode('utf-8') + '\n')
 
 class NavilinkChannel:
@@ -370,10 +888,31 @@ class NavilinkChannel:
         self.callbacks = []
         self.channel_status = {}
         self.unit_list = {}
+        self.aggregates = {}
         self.waiting_for_response = False
+        self.last_status_request = None
+        self.last_status_update = None
+        self.status_updated = None
 
     def register_callback(self,callback):
         self.callbacks.append(callback)
+        # The first subscriber of an idle channel gets fresh data instead of waiting for the next poll
+        if len(self.callbacks) == 1 and self.hub.connected and (self.last_status_update is None or self.hub.loop.time() - self.last_status_update > self.hub.polling_interval):
+            self.hub.supervisor.spawn(self.hub._get_channel_status_all(channels=[self]), name = "Refresh Channel " + str(self.channel_number))
+
+    def status_age(self):
+        """Seconds since the channel's status was last received, None before the first one"""
+        if self.last_status_update is None:
+            return None
+        return self.hub.loop.time() - self.last_status_update
+
+    def poll_due(self,now):
+        """Return whether regular polls should request this channel's status"""
+        if self.callbacks:
+            return True
+        if not IDLE_POLL_INTERVAL:
+            return False
+        return self.last_status_request is None or now - self.last_status_request >= IDLE_POLL_INTERVAL
 
     def deregister_callback(self,callback):
         if self.callbacks:
@@ -381,33 +920,56 @@ class NavilinkChannel:
 
     def update_channel_status(self,channel_status):
         self.channel_status = self.convert_channel_status(channel_status)
+        self.unit_list = {unit_info.get("unitNumber",""):unit_info for unit_info in self.channel_status.get("unitInfo",{}).get("unitStatusList",[])}
+        self.aggregates = self.compute_aggregates()
+        self.last_status_update = self.hub.loop.time()
+        self.status_updated = datetime.now(timezone.utc)
+        if self.hub.telemetry:
+            self.hub.telemetry.record(self.hub.topics.mac_address if self.hub.topics else "",self.channel_number,self.channel_status)
         if not self.waiting_for_response:
             self.publish_update()
 
     def publish_update(self):
         if len(self.callbacks) > 0:
-            [callback() for callback in self.callbacks]
+            if self.hub.watchdog:
+                with self.hub.watchdog.timed("publish_update", "channel " + str(self.channel_number)):
+                    [callback() for callback in self.callbacks]
+            else:
+                [callback() for callback in self.callbacks]
+            self.hub.metrics.inc("callbacks_dispatched", str(self.channel_number), len(self.callbacks))
 
     async def set_power_state(self,state):
         if not self.waiting_for_response:
             self.waiting_for_response = True
-            await self.hub._power_command(state,self.channel_number)
+            try:
+                acknowledged = await self.hub._power_command(state,self.channel_number)
+            finally:
+                self.waiting_for_response = False
             self.publish_update()
-            self.waiting_for_response = False
+            return acknowledged
+        return False
 
     async def set_hot_button_state(self,state):
         if not self.waiting_for_response:
             self.waiting_for_response = True
-            await self.hub._hot_button_command(state,self.channel_number)
+            try:
+                acknowledged = await self.hub._hot_button_command(state,self.channel_number)
+            finally:
+                self.waiting_for_response = False
             self.publish_update()
-            self.waiting_for_response = False
+            return acknowledged
+        return False
 
     async def set_temperature(self,temp):
         if not self.waiting_for_response:
             self.waiting_for_response = True
-            await self.hub._temperature_command(temp,self.channel_number)
+            try:
+                acknowledged = await self.hub._temperature_command(temp,self.channel_number)
+            finally:
+                self.waiting_for_response = False
             self.publish_update()
-            self.waiting_for_response = False
+            return acknowledged
+        return False
 
     def convert_channel_status(self,channel_status):
         channel_status["powerStatus"] = channel_status["powerStatus"] == 1
@@ -471,6 +1033,23 @@ class NavilinkChannel:
 
         return channel_status
 
+    def compute_aggregates(self):
+        """Totals and means over all units of the channel, in the same units as the unit values"""
+        unit_list = list(self.unit_list.values())
+        if not unit_list:
+            return {}
+        count = len(unit_list)
+        total_flow_rate = sum(unit_info.get("DHWFlowRate",0) for unit_info in unit_list)
+        return {
+            "total_flow_rate": round(total_flow_rate, 1),
+            "mean_flow_rate": round(total_flow_rate/count, 1),
+            "total_gas_instant_usage": round(sum(unit_info.get("gasInstantUsage",0) for unit_info in unit_list), 1),
+            "mean_inlet_temp": round(sum(unit_info.get("currentInletTemp",0) for unit_info in unit_list)/count, 1),
+            "mean_outlet_temp": round(sum(unit_info.get("currentOutletTemp",0) for unit_info in unit_list)/count, 1),
+            "total_accumulated_gas_usage": round(sum(unit_info.get("accumulatedGasUsage",0) for unit_info in unit_list), 1),
+            "active_units": sum(1 for unit_info in unit_list if unit_info.get("DHWFlowRate",0) > 0 or unit_info.get("gasInstantUsage",0) > 0),
+        }
+
     def convert_channel_info(self,channel_info):
         if channel_info.get("temperatureType",2) == TemperatureType.CELSIUS.value:
             channel_info["setupDHWTempMin"] = round(channel_info["setupDHWTempMin"]/ 2.0, 1)
@@ -479,7 +1058,11 @@ class NavilinkChannel:
         return channel_info
         
     def is_available(self):
-        return self.hub.connected
+        return self.hub.connected and self.hub.gateway_online
+
+def topic_label(topic):
+    """Return the last path segment of a topic, used to label metrics by message type"""
+    return topic.rsplit('/',1)[-1]
 
 class Topics:
 
@@ -561,6 +1144,15 @@ class Topics:
     def control(self):
         return self.req + 'control'
 
+    def sub(self, name):
+        return self.req + 'res/' + name
+
+    def sub_all(self):
+        return self.req + 'res/#'
+
+    def res_all(self):
+        return self.res + '#'
+
     def connection(self):
         return self.req + 'connection'
 
@@ -683,8 +1275,20 @@ class PollingError(Exception):
 class DisconnectEvent(Exception):
     """Server disconnected"""
 
+class LivenessTimeout(Exception):
+    """Connection stopped answering requests"""
+
 class NoChannelInformation(Exception):
     """No Channel Information"""
 
 class NoAccessKey(Exception):
     """Access key, Secret key, or Session token missing"""
+
+class ControlFailed(Exception):
+    """The gateway rejected a control command"""
+
+    def __init__(self, channel_number, mode, fail_code) -> None:
+        super().__init__("Navien gateway rejected " + str(mode) + " command for channel " + str(channel_number) + " with fail code " + str(fail_code))
+        self.channel_number = channel_number
+        self.mode = mode
+        self.fail_code = fail_code
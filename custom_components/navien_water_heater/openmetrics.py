@@ -0,0 +1,88 @@
+"""OpenMetrics exposition of NaviLink device telemetry, rendered from cached series."""
+import weakref
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+GAUGE = "gauge"
+COUNTER = "counter"
+
+# name, type, help, whether it is read from the channel status or from each unit, status key
+CHANNEL = "channel"
+UNIT = "unit"
+FAMILIES = [
+    ("navien_power_on", GAUGE, "Whether the channel is powered on", CHANNEL, "powerStatus"),
+    ("navien_on_demand_on", GAUGE, "Whether on demand (Hot Button) recirculation is active", CHANNEL, "onDemandUseFlag"),
+    ("navien_heating_power_percent", GAUGE, "Heating power of the channel in percent", CHANNEL, "avgCalorie"),
+    ("navien_setpoint_temperature", GAUGE, "Hot water setpoint temperature", CHANNEL, "DHWSettingTemp"),
+    ("navien_channel_inlet_temperature", GAUGE, "Average inlet temperature of the channel", CHANNEL, "avgInletTemp"),
+    ("navien_channel_outlet_temperature", GAUGE, "Average outlet temperature of the channel", CHANNEL, "avgOutletTemp"),
+    ("navien_flow_rate", GAUGE, "Hot water flow rate of the unit", UNIT, "DHWFlowRate"),
+    ("navien_inlet_temperature", GAUGE, "Inlet temperature of the unit", UNIT, "currentInletTemp"),
+    ("navien_outlet_temperature", GAUGE, "Outlet temperature of the unit", UNIT, "currentOutletTemp"),
+    ("navien_gas_instant_usage", GAUGE, "Current gas use of the unit", UNIT, "gasInstantUsage"),
+    ("navien_gas_accumulated_usage", COUNTER, "Cumulative gas use of the unit", UNIT, "accumulatedGasUsage"),
+]
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def format_value(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class ChannelSeries:
+    """The sample lines of one channel per metric family, rebuilt only when the channel's status changed"""
+
+    __slots__ = ("status", "lines")
+
+    def __init__(self) -> None:
+        self.status = None
+        self.lines = {}
+
+    def refresh(self, hub, channel):
+        # Every update replaces channel_status with a new dict, so identity tells whether it changed
+        if channel.channel_status is self.status:
+            return self.lines
+        self.status = channel.channel_status
+        device_info = (hub.device_info or {}).get("deviceInfo",{})
+        labels = 'gateway="' + escape(device_info.get("macAddress","unknown")) + '",name="' + escape(device_info.get("deviceName","unknown")) + '",channel="' + str(channel.channel_number) + '"'
+        self.lines = {}
+        for name, metric_type, _, scope, key in FAMILIES:
+            sample = name + "_total" if metric_type == COUNTER else name
+            if scope == CHANNEL:
+                if (value := self.status.get(key)) is not None:
+                    self.lines[name] = sample + "{" + labels + "} " + format_value(value) + "\n"
+            else:
+                self.lines[name] = "".join(
+                    sample + "{" + labels + ',unit="' + str(unit_number) + '"} ' + format_value(unit_info[key]) + "\n"
+                    for unit_number, unit_info in channel.unit_list.items()
+                    if unit_info.get(key) is not None
+                )
+        return self.lines
+
+_series = weakref.WeakKeyDictionary()
+
+def channel_series(hub, channel):
+    if (series := _series.get(channel)) is None:
+        series = _series[channel] = ChannelSeries()
+    return series.refresh(hub, channel)
+
+def render(hubs):
+    """Render the exposition for all hubs, re-rendering only the channels that were updated since the last scrape"""
+    gateway_lines = []
+    channel_lines = []
+    for hub in hubs:
+        device_info = (hub.device_info or {}).get("deviceInfo",{})
+        labels = 'gateway="' + escape(device_info.get("macAddress","unknown")) + '",name="' + escape(device_info.get("deviceName","unknown")) + '"'
+        gateway_lines.append("navien_gateway_up{" + labels + "} " + ("1" if hub.connected and hub.gateway_online else "0") + "\n")
+        for channel in list(hub.channels.values()):
+            if channel.channel_status:
+                channel_lines.append(channel_series(hub, channel))
+    output = ["# TYPE navien_gateway_up gauge\n# HELP navien_gateway_up Whether the hub is connected and the gateway online\n"]
+    output.extend(gateway_lines)
+    for name, metric_type, help_text, _, _ in FAMILIES:
+        output.append("# TYPE " + name + " " + metric_type + "\n# HELP " + name + " " + help_text + "\n")
+        output.extend(lines.get(name, "") for lines in channel_lines)
+    output.append("# EOF\n")
+    return "".join(output)
@@ -0,0 +1,109 @@
+"""Process wide request rate budget toward the Navien cloud, shared by all NaviLink hubs."""
+import asyncio
+
+# Sustained requests per second and burst size for each account, and for all accounts together
+ACCOUNT_RATE = 2.0
+ACCOUNT_BURST = 20
+GLOBAL_RATE = 10.0
+GLOBAL_BURST = 50
+
+class TokenBucket:
+    """Token bucket refilled at rate tokens per second up to burst tokens.
+
+    Tokens can be forced below zero by requests that must go out anyway, later
+    requests that can wait then pay the debt back before they are sent.
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = None
+
+    def refill(self, now):
+        if self.updated is not None:
+            self.tokens = min(self.burst, self.tokens + max(0, now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Seconds until a token is available"""
+        self.refill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def stats(self, now):
+        self.refill(now)
+        return {"rate": self.rate, "burst": self.burst, "tokens": round(self.tokens, 2)}
+
+class RateBudget:
+    """Global and per account token buckets for the requests sent by every hub.
+
+    Deferrable requests (polls) wait until both the account's and the global
+    bucket have a token. Other requests (commands and their follow-up status
+    requests) are always sent immediately and take their token even if that
+    puts a bucket into debt, so the polls that follow are deferred instead.
+    Only used from the event loop, and timed by the loop's clock.
+    """
+
+    def __init__(self, account_rate=ACCOUNT_RATE, account_burst=ACCOUNT_BURST, global_rate=GLOBAL_RATE, global_burst=GLOBAL_BURST) -> None:
+        self.account_rate = account_rate
+        self.account_burst = account_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.accounts = {}
+        self.sent = 0
+        self.forced = 0
+        self.deferred = 0
+
+    def account_bucket(self, account):
+        if (bucket := self.accounts.get(account)) is None:
+            bucket = self.accounts[account] = TokenBucket(self.account_rate, self.account_burst)
+        return bucket
+
+    async def acquire(self, account, deferrable=True):
+        """Take a token for one request, waiting first if the request is deferrable
+
+        Returns the number of seconds the request was deferred.
+        """
+        loop = asyncio.get_running_loop()
+        bucket = self.account_bucket(account)
+        waited = 0
+        if deferrable:
+            while (delay := max(bucket.wait_time(loop.time()), self.global_bucket.wait_time(loop.time()))) > 0:
+                if not waited:
+                    self.deferred += 1
+                await asyncio.sleep(delay)
+                waited += delay
+        else:
+            now = loop.time()
+            if bucket.wait_time(now) or self.global_bucket.wait_time(now):
+                self.forced += 1
+        bucket.take()
+        self.global_bucket.take()
+        self.sent += 1
+        return waited
+
+    def stats(self, account):
+        now = asyncio.get_running_loop().time()
+        return {
+            "account": self.account_bucket(account).stats(now),
+            "global": self.global_bucket.stats(now),
+            "accounts": len(self.accounts),
+            "sent": self.sent,
+            "deferred": self.deferred,
+            "forced": self.forced,
+        }
+
+_budget = None
+
+def get_rate_budget():
+    """Return the budget shared by all hubs in this process"""
+    global _budget
+    if _budget is None:
+        _budget = RateBudget()
+    return _budget
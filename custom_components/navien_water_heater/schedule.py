@@ -0,0 +1,82 @@
+"""Fleet wide scheduling of polls and maintenance reconnects for all NaviLink hubs."""
+import zlib
+from datetime import datetime, timedelta
+
+# Daily maintenance reconnects start at this local hour and are spread over this many seconds
+REFRESH_HOUR = 2
+REFRESH_WINDOW = 2 * 3600
+
+def device_hash(key):
+    """Stable hash of a device key, the same in every process and across restarts"""
+    return zlib.crc32(str(key).encode("utf-8"))
+
+class FleetScheduler:
+    """
+    Spread the polls and the daily reconnects of all hubs in the process.
+
+    Hubs polling at the same interval get evenly spaced phases within it, ordered by a stable
+    hash of their device key, so with N hubs a poll starts every interval/N seconds instead of
+    N at once. Phases are relative to the event loop's clock and are recomputed when hubs join
+    or leave. The daily reconnect of each device is offset into the refresh window by the same
+    hash, so it does not move between restarts. Only used from the event loop.
+    """
+
+    def __init__(self) -> None:
+        self.intervals = {}
+        self.phases = {}
+
+    def register(self, key, interval):
+        if self.intervals.get(key) != interval:
+            self.intervals[key] = interval
+            self._assign_phases()
+
+    def unregister(self, key):
+        if self.intervals.pop(key, None) is not None:
+            self._assign_phases()
+
+    def _assign_phases(self):
+        groups = {}
+        for key, interval in self.intervals.items():
+            groups.setdefault(interval, []).append(key)
+        self.phases = {}
+        for interval, keys in groups.items():
+            keys.sort(key=lambda key: (device_hash(key), key))
+            for index, key in enumerate(keys):
+                self.phases[key] = interval * index / len(keys)
+
+    def poll_delay(self, key, interval, now, minimum=0.1):
+        """Seconds from now until the hub's next poll slot, at least minimum"""
+        phase = self.phases.get(key, 0)
+        delay = (phase - now) % interval
+        while delay < minimum:
+            delay += interval
+        return delay
+
+    def refresh_offset(self, key, window=REFRESH_WINDOW):
+        """Seconds after REFRESH_HOUR at which the device's daily reconnect happens"""
+        if window <= 0:
+            return 0
+        return device_hash(key) % int(window)
+
+    def next_refresh(self, key, now, window=REFRESH_WINDOW):
+        """The local time of the device's next daily reconnect after now"""
+        target = datetime(now.year, now.month, now.day, REFRESH_HOUR, 0, 0) + timedelta(seconds=self.refresh_offset(key, window))
+        if now > target:
+            target += timedelta(days=1)
+        return target
+
+    def stats(self, key, window=REFRESH_WINDOW):
+        return {
+            "hubs": len(self.intervals),
+            "poll_phase": round(self.phases.get(key, 0), 2),
+            "refresh_offset": self.refresh_offset(key, window),
+        }
+
+_scheduler = None
+
+def get_fleet_scheduler():
+    """Return the scheduler shared by all hubs in this process"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = FleetScheduler()
+    return _scheduler
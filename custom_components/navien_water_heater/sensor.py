@@ -4,12 +4,13 @@ from homeassistant.components.sensor import (
     SensorEntity,
     SensorStateClass,
 )
-from .navien_api import (TemperatureType)
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import (
     PERCENTAGE,
+    EntityCategory,
     UnitOfPower,
     UnitOfTemperature,
+    UnitOfTime,
     UnitOfVolume,
 )
 
@@ -18,12 +19,16 @@ FLOW_GALLONS_PER_MIN = 'gal/min'
 FLOW_LITERS_PER_MIN = 'liters/min'
 
 from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.typing import StateType
-from .const import DOMAIN
+from .const import DOMAIN, SIGNAL_OPTIONS_UPDATED
+from .entity import NavienEntity, channel_metadata
+from .throttle import StateThrottle, throttle_from_options, throttle_settings
 from asyncio import sleep
 import logging
+import time
 _LOGGER=logging.getLogger(__name__)
 
 class GenericSensorDescription():
@@ -55,6 +60,52 @@ class TempSensorDescription():
         else:
             return temp
 
+class MetricSensorDescription():
+    """Class to read a runtime metric from the hub"""
+    def __init__(self, key, name, state_class, native_unit_of_measurement=None, label=None, histogram=False, scale=1) -> None:
+        self.key = key
+        self.name = name
+        self.state_class = state_class
+        self.native_unit_of_measurement = native_unit_of_measurement
+        self.label = label
+        self.histogram = histogram
+        self.scale = scale
+
+    def value(self,metrics):
+        if self.histogram:
+            histogram = metrics.histogram(self.key,self.label)
+            if histogram is None or not histogram.count:
+                return None
+            return round(histogram.mean*self.scale, 1)
+        return metrics.counter(self.key,self.label)
+
+    def attributes(self,metrics):
+        if self.histogram:
+            histogram = metrics.histogram(self.key,self.label)
+            return histogram.as_dict() if histogram else {}
+        return {label or "total": value for (key, label), value in list(metrics.counters.items()) if key == self.key}
+
+METRIC_SENSORS = [
+    MetricSensorDescription("request_rtt", "Status Request RTT", SensorStateClass.MEASUREMENT, UnitOfTime.MILLISECONDS, label="channelstatus", histogram=True, scale=1000),
+    MetricSensorDescription("request_timeouts", "Request Timeouts", SensorStateClass.TOTAL_INCREASING),
+    MetricSensorDescription("executor_wait", "Executor Wait", SensorStateClass.MEASUREMENT, UnitOfTime.MILLISECONDS, histogram=True, scale=1000),
+    MetricSensorDescription("reconnects", "Reconnects", SensorStateClass.TOTAL_INCREASING),
+    MetricSensorDescription("messages_received", "Messages Received", SensorStateClass.TOTAL_INCREASING),
+    MetricSensorDescription("callbacks_dispatched", "Callbacks Dispatched", SensorStateClass.TOTAL_INCREASING),
+    MetricSensorDescription("poll_cycle_duration", "Poll Cycle Duration", SensorStateClass.MEASUREMENT, UnitOfTime.SECONDS, histogram=True),
+]
+
+# Channel aggregates exposed as sensors on cascades, with the unit sensor type whose units and throttling they share
+AGGREGATE_SENSORS = {
+    "total_flow_rate": ("DHWFlowRate", "Total Hot Water Flow"),
+    "mean_flow_rate": ("DHWFlowRate", "Mean Hot Water Flow"),
+    "total_gas_instant_usage": ("gasInstantUsage", "Total Current Gas Use"),
+    "mean_inlet_temp": ("currentInletTemp", "Mean Inlet Temp"),
+    "mean_outlet_temp": ("currentOutletTemp", "Mean Hot Water Temp"),
+    "total_accumulated_gas_usage": ("accumulatedGasUsage", "Total Cumulative Gas Use"),
+    "active_units": (None, "Active Units"),
+}
+
 def get_description(hass_units,navien_units,sensor_type):    
     return {
         "gasInstantUsage": GenericSensorDescription(
@@ -99,153 +150,171 @@ async def async_setup_entry(
 
     navilink = hass.data[DOMAIN][entry.entry_id]
     sensors = []
+    throttled = []
+
+    def tracked_throttle(sensor_type):
+        throttle = throttle_from_options(entry.options,sensor_type)
+        throttled.append((sensor_type, throttle))
+        return throttle
+
     for channel in navilink.channels.values():
-        navien_units = "us_customary" if channel.channel_info.get("temperatureType",2) == TemperatureType.FAHRENHEIT.value else "metric"
+        navien_units = channel_metadata(navilink, channel).navien_units
         hass_units = "us_customary" if hass.config.units.temperature_unit == UnitOfTemperature.FAHRENHEIT else "metric"
-        sensors.append(NavienAvgCalorieSensor(navilink, channel))
+        sensors.append(NavienAvgCalorieSensor(navilink, channel, tracked_throttle("avgCalorie")))
+        sensors.append(NavienStatusUpdatedSensor(navilink, channel))
         for unit_info in channel.channel_status.get("unitInfo",{}).get("unitStatusList",[]):
             for sensor_type in ["gasInstantUsage","accumulatedGasUsage","DHWFlowRate","currentInletTemp","currentOutletTemp"]:
-                sensors.append(NavienSensor(hass, navilink, channel, unit_info, sensor_type, get_description(hass_units,navien_units,sensor_type)))
+                sensors.append(NavienSensor(hass, navilink, channel, unit_info, sensor_type, get_description(hass_units,navien_units,sensor_type), tracked_throttle(sensor_type)))
+        if len(channel.unit_list) > 1:
+            for aggregate, (sensor_type, name) in AGGREGATE_SENSORS.items():
+                description = get_description(hass_units,navien_units,sensor_type) if sensor_type else None
+                sensors.append(NavienAggregateSensor(navilink, channel, aggregate, name, description, tracked_throttle(sensor_type) if sensor_type else StateThrottle()))
+    for description in METRIC_SENSORS:
+        sensors.append(NavienMetricSensor(navilink, description))
     async_add_entities(sensors)
 
-class NavienAvgCalorieSensor(SensorEntity):
-    """Representation of a Navien Sensor device."""
+    @callback
+    def async_options_updated(options):
+        """Apply changed throttling options to the running sensors."""
+        for sensor_type, throttle in throttled:
+            throttle.configure(**throttle_settings(options, sensor_type))
 
-    def __init__(self, navilink, channel):
+    entry.async_on_unload(async_dispatcher_connect(hass, SIGNAL_OPTIONS_UPDATED.format(entry.entry_id), async_options_updated))
+
+class NavienMetricSensor(SensorEntity):
+    """Diagnostic sensor exposing one of the hub's runtime metrics."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_should_poll = False
+
+    def __init__(self, navilink, metric_description):
         """Initialize the sensor."""
         self.navilink = navilink
-        self.channel = channel
+        self.metric_description = metric_description
+        device_info = navilink.device_info.get("deviceInfo",{})
+        self._attr_name = device_info.get("deviceName","UNKNOWN") + " " + metric_description.name
+        self._attr_unique_id = device_info.get("macAddress","unknown") + "metric_" + metric_description.key
+        self._attr_state_class = metric_description.state_class
+        self._attr_native_unit_of_measurement = metric_description.native_unit_of_measurement
+        self._attr_device_info = DeviceInfo(
+            identifiers = {(DOMAIN, device_info.get("macAddress","unknown"))},
+            manufacturer = "Navien",
+            name = device_info.get("deviceName","unknown"),
+        )
 
     async def async_added_to_hass(self) -> None:
         """Run when this Entity has been added to HA."""
-        self.channel.register_callback(self.update_state)
+        self.navilink.register_callback(self.async_write_ha_state)
 
     async def async_will_remove_from_hass(self) -> None:
         """Entity being removed from hass."""
-        self.channel.deregister_callback(self.update_state)
-
-    def update_state(self):
-        self.async_write_ha_state()
+        self.navilink.deregister_callback(self.async_write_ha_state)
 
     @property
-    def available(self):
-        """Return if the the sensor is online or not."""
-        return self.channel.is_available()
+    def native_value(self) -> StateType:
+        """Return the value reported by the sensor."""
+        return self.metric_description.value(self.navilink.metrics)
 
     @property
-    def device_info(self) -> DeviceInfo:
-        """Return device registry information for this entity."""
-        return DeviceInfo(
-            identifiers = {(DOMAIN, self.navilink.device_info.get("deviceInfo",{}).get("macAddress","unknown") + "_" + str(self.channel.channel_number))},
-            manufacturer = "Navien",
-            name = self.navilink.device_info.get("deviceInfo",{}).get("deviceName","unknown") + " CH" + str(self.channel.channel_number),
-        )
+    def extra_state_attributes(self):
+        """Return the per label breakdown of the metric."""
+        return self.metric_description.attributes(self.navilink.metrics)
 
-    @property
-    def name(self):
-        """Return the name of the entity."""
-        return "CH" + str(self.channel.channel_number) + " Heating Power"
+class NavienStatusUpdatedSensor(NavienEntity, SensorEntity):
+    """Diagnostic sensor showing when the channel's status was last received."""
 
-    @property
-    def unique_id(self):
-        """Return the unique ID of the entity."""
-        return self.navilink.device_info.get("deviceInfo",{}).get("macAddress","unknown") + str(self.channel.channel_number) + "avgCalorie"
+    _attr_device_class = SensorDeviceClass.TIMESTAMP
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
 
-    @property
-    def device_class(self) -> SensorDeviceClass:
-        """Return the class of this entity."""
-        return SensorDeviceClass.POWER_FACTOR
+    def __init__(self, navilink, channel):
+        """Initialize the sensor."""
+        super().__init__(navilink, channel, "status_updated")
+        self._attr_name = self.metadata.channel_name + " Last Update"
 
     @property
-    def state_class(self) -> SensorStateClass:
-        """Return the state class of this entity, if any."""
-        return SensorStateClass.MEASUREMENT
+    def native_value(self):
+        """Return the time of the last status update."""
+        return self.channel.status_updated
 
+class NavienAvgCalorieSensor(NavienEntity, SensorEntity):
+    """Representation of a Navien Sensor device."""
+
+    _attr_device_class = SensorDeviceClass.POWER_FACTOR
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = PERCENTAGE
+
+    def __init__(self, navilink, channel, throttle):
+        """Initialize the sensor."""
+        super().__init__(navilink, channel, "avgCalorie")
+        self._attr_name = self.metadata.channel_name + " Heating Power"
+        self.throttle = throttle
+
+    def update_state(self):
+        if self.throttle.should_write(self.native_value, time.monotonic(), self.available):
+            self.async_write_ha_state()
 
-    @property
-    def native_unit_of_measurement(self):
-        """Return the unit of measurement of this entity, if any."""
-        return PERCENTAGE
-    
     @property
     def native_value(self) -> StateType:
         """Return the value reported by the sensor."""
         return self.channel.channel_status.get("avgCalorie",0)
         
-class NavienSensor(SensorEntity):
+class NavienSensor(NavienEntity, SensorEntity):
     """Representation of a Navien Sensor device."""
 
-    def __init__(self, hass, navilink, channel, unit_info, sensor_type, sensor_description):
+    def __init__(self, hass, navilink, channel, unit_info, sensor_type, sensor_description, throttle):
         """Initialize the sensor."""
-        self.navilink = navilink
-        self.channel = channel
         self.unit_info = unit_info
         self.sensor_type = sensor_type
         self.sensor_description = sensor_description
         self.unit_number = unit_info.get("unitNumber","")
+        super().__init__(navilink, channel, str(self.unit_number) + sensor_type)
+        if self.unit_number:
+            self._attr_name = self.metadata.channel_name + "_UNIT" + str(self.unit_number) + " " + sensor_description.name
+        else:
+            self._attr_name = self.metadata.channel_name + " " + sensor_description.name
+        self._attr_device_class = sensor_description.device_class
+        self._attr_state_class = sensor_description.state_class
+        self._attr_native_unit_of_measurement = sensor_description.native_unit_of_measurement
         self.hass = hass
-
-    async def async_added_to_hass(self) -> None:
-        """Run when this Entity has been added to HA."""
-        self.channel.register_callback(self.update_state)
-
-    async def async_will_remove_from_hass(self) -> None:
-        """Entity being removed from hass."""
-        self.channel.deregister_callback(self.update_state)
+        self.throttle = throttle
 
     def update_state(self):
-        hass_units = "us_customary" if self.hass.config.units.temperature_unit == UnitOfTemperature.FAHRENHEIT else "metric"
-        navien_units = "us_customary" if self.channel.channel_info.get("temperatureType",2) == TemperatureType.FAHRENHEIT.value else "metric"
-        for unit_info in self.channel.channel_status.get("unitInfo",{}).get("unitStatusList",[]):
-            if unit_info.get("unitNumber","") == self.unit_number:
-                self.unit_info = unit_info
-        self.sensor_description = get_description(hass_units,navien_units,self.sensor_type)
-        self.async_write_ha_state()
+        self.unit_info = self.channel.unit_list.get(self.unit_number, self.unit_info)
+        if self.throttle.should_write(self.native_value, time.monotonic(), self.available):
+            self.async_write_ha_state()
 
     @property
-    def available(self):
-        """Return if the the sensor is online or not."""
-        return self.channel.is_available()
+    def native_value(self) -> StateType:
+        """Return the value reported by the sensor."""
+        return self.sensor_description.convert(self.unit_info.get(self.sensor_type,0))
 
-    @property
-    def device_info(self) -> DeviceInfo:
-        """Return device registry information for this entity."""
-        return DeviceInfo(
-            identifiers = {(DOMAIN, self.navilink.device_info.get("deviceInfo",{}).get("macAddress","unknown") + "_" + str(self.channel.channel_number))},
-            manufacturer = "Navien",
-            name = self.navilink.device_info.get("deviceInfo",{}).get("deviceName","unknown") + " CH" + str(self.channel.channel_number),
-        )
+class NavienAggregateSensor(NavienEntity, SensorEntity):
+    """Total or mean over all units of a cascade channel, computed by the hub once per status update."""
 
-    @property
-    def name(self):
-        """Return the name of the entity."""
-        if unit_number := self.unit_info.get("unitNumber", None):
-            return "CH" + str(self.channel.channel_number) + "_UNIT" + str(unit_number) + " " + self.sensor_description.name
+    def __init__(self, navilink, channel, aggregate, name, sensor_description, throttle):
+        """Initialize the sensor."""
+        super().__init__(navilink, channel, "aggregate_" + aggregate)
+        self.aggregate = aggregate
+        self.sensor_description = sensor_description
+        self._attr_name = self.metadata.channel_name + " " + name
+        if sensor_description:
+            self._attr_device_class = sensor_description.device_class
+            self._attr_state_class = sensor_description.state_class
+            self._attr_native_unit_of_measurement = sensor_description.native_unit_of_measurement
         else:
-            return "CH" + str(self.channel.channel_number) + " " + self.sensor_description.name
-
-    @property
-    def unique_id(self):
-        """Return the unique ID of the entity."""
-        return self.navilink.device_info.get("deviceInfo",{}).get("macAddress","unknown") + str(self.channel.channel_number) + str(self.unit_info.get("unitNumber","")) + self.sensor_type
-
-    @property
-    def device_class(self) -> SensorDeviceClass:
-        """Return the class of this entity."""
-        return self.sensor_description.device_class
-
-    @property
-    def state_class(self) -> SensorStateClass:
-        """Return the state class of this entity, if any."""
-        return self.sensor_description.state_class
+            self._attr_state_class = SensorStateClass.MEASUREMENT
+        self.throttle = throttle
 
+    def update_state(self):
+        if self.throttle.should_write(self.native_value, time.monotonic(), self.available):
+            self.async_write_ha_state()
 
-    @property
-    def native_unit_of_measurement(self):
-        """Return the unit of measurement of this entity, if any."""
-        return self.sensor_description.native_unit_of_measurement
-    
     @property
     def native_value(self) -> StateType:
         """Return the value reported by the sensor."""
-        return self.sensor_description.convert(self.unit_info.get(self.sensor_type,0))
+        value = self.channel.aggregates.get(self.aggregate)
+        if value is None or self.sensor_description is None:
+            return value
+        return self.sensor_description.convert(value)
\ No newline at end of file
@@ -0,0 +1,43 @@
+"""Integration level services for the Navien NaviLink Water Heater Integration."""
+import logging
+import voluptuous as vol
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
+import homeassistant.helpers.config_validation as cv
+from .const import DOMAIN
+from .control import CONTROL_MODES, DEFAULT_CONCURRENCY, RESULT_OK, async_bulk_control, select_targets
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_BULK_CONTROL = "bulk_control"
+
+BULK_CONTROL_SCHEMA = vol.Schema(
+    {
+        vol.Required("mode"): vol.In(CONTROL_MODES),
+        vol.Required("value"): vol.Any(vol.Coerce(float), cv.boolean),
+        vol.Optional("gateways", default=[]): vol.All(cv.ensure_list, [cv.string]),
+        vol.Optional("channels", default=[]): vol.All(cv.ensure_list, [vol.Coerce(int)]),
+        vol.Optional("max_concurrency", default=DEFAULT_CONCURRENCY): vol.All(vol.Coerce(int), vol.Range(min=1, max=64)),
+    }
+)
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the integration's services once, whatever the number of config entries."""
+    if hass.services.has_service(DOMAIN, SERVICE_BULK_CONTROL):
+        return
+
+    async def async_handle_bulk_control(call: ServiceCall) -> ServiceResponse:
+        """Send one command to the selected channels of all gateways concurrently."""
+        targets = select_targets(hass.data.get(DOMAIN, {}).values(), call.data["gateways"], call.data["channels"])
+        results = await async_bulk_control(targets, call.data["mode"], call.data["value"], call.data["max_concurrency"])
+        failed = [result for result in results if result["result"] != RESULT_OK]
+        if failed:
+            _LOGGER.warning(str(len(failed)) + " of " + str(len(results)) + " bulk control targets failed: " + str(failed))
+        return {"results": results}
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_BULK_CONTROL,
+        async_handle_bulk_control,
+        schema=BULK_CONTROL_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
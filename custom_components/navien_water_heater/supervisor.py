@@ -0,0 +1,71 @@
+"""Ownership and restart backoff of the background tasks of a NaviLink hub."""
+import asyncio
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+# Delay before the first reconnect after a reset, doubled for every reset in a row up to the maximum
+RESTART_BACKOFF = 15
+RESTART_BACKOFF_MAX = 600
+# A connection that lasted this long resets the delay to RESTART_BACKOFF
+RESTART_STABLE = 600
+
+class TaskSupervisor:
+    """
+    Own every background task of a hub so that none outlives it.
+
+    Tasks are started with spawn() and dropped once they are done. close() cancels all tasks
+    still running and waits for them to finish, after which spawn() refuses new ones, so an
+    unloaded hub leaves no poll, refresh or reconnect task behind. next_delay() returns the
+    reconnect delay, growing while connections keep failing quickly. Only used from the event loop.
+    """
+
+    def __init__(self, backoff=RESTART_BACKOFF, max_backoff=RESTART_BACKOFF_MAX, stable=RESTART_STABLE) -> None:
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stable = stable
+        self.delay = backoff
+        self.restarts = 0
+        self.tasks = set()
+        self.closed = False
+
+    def spawn(self, coroutine, name=None):
+        """Start a task owned by the supervisor, returns None once it is closed"""
+        if self.closed:
+            coroutine.close()
+            return None
+        task = asyncio.get_running_loop().create_task(coroutine, name=name)
+        self.tasks.add(task)
+        task.add_done_callback(self._done)
+        return task
+
+    def _done(self, task):
+        self.tasks.discard(task)
+        if not task.cancelled() and (e := task.exception()) is not None:
+            _LOGGER.debug(task.get_name() + ": " + str(type(e).__name__) + ": " + str(e))
+
+    def next_delay(self, lasted):
+        """Return the delay before reconnecting after a connection that lasted this many seconds"""
+        if lasted >= self.stable:
+            self.delay = self.backoff
+        delay = self.delay
+        self.delay = min(self.delay * 2, self.max_backoff)
+        self.restarts += 1
+        return delay
+
+    async def close(self):
+        """Cancel all tasks and wait for them to finish"""
+        self.closed = True
+        current = asyncio.current_task()
+        tasks = [task for task in self.tasks if task is not current]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self):
+        return {
+            "tasks": sorted(task.get_name() for task in self.tasks),
+            "restarts": self.restarts,
+            "next_backoff": self.delay,
+        }
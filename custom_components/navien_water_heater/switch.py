@@ -5,9 +5,9 @@ from homeassistant.components.switch import (
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.entity import DeviceInfo
 from .navien_api import DeviceSorting
 from .const import DOMAIN
+from .entity import NavienEntity
 
 async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
@@ -22,44 +22,12 @@ async def async_setup_entry(
     async_add_entities(devices)
 
 
-class NavienOnDemandSwitchEntity(SwitchEntity):
+class NavienOnDemandSwitchEntity(NavienEntity, SwitchEntity):
     """Define a Navien Hot Button/On Demand/External Recirculator Entity."""
 
     def __init__(self, navilink, channel):
-        self.navilink = navilink
-        self.channel = channel
-
-    async def async_added_to_hass(self) -> None:
-        """Run when this Entity has been added to HA."""
-        self.channel.register_callback(self.async_write_ha_state)
-
-    async def async_will_remove_from_hass(self) -> None:
-        """Entity being removed from hass."""
-        self.channel.deregister_callback(self.async_write_ha_state)
-
-    @property
-    def available(self):
-        """Return if the the device is online or not."""
-        return self.channel.is_available()
-
-    @property
-    def device_info(self) -> DeviceInfo:
-        """Return device registry information for this entity."""
-        return DeviceInfo(
-            identifiers = {(DOMAIN, self.navilink.device_info.get("deviceInfo",{}).get("macAddress","unknown") + "_" + str(self.channel.channel_number))},
-            manufacturer = "Navien",
-            name = self.navilink.device_info.get("deviceInfo",{}).get("deviceName","unknown") + " CH" + str(self.channel.channel_number)
-        )
-
-    @property
-    def name(self):
-        """Return the name of the entity."""
-        return self.navilink.device_info.get("deviceInfo",{}).get("deviceName","UNKNOWN") + " Hot Button CH" + str(self.channel.channel_number)
-
-    @property
-    def unique_id(self):
-        """Return the unique ID of the entity."""
-        return self.navilink.device_info.get("deviceInfo",{}).get("macAddress","unknown") + str(self.channel.channel_number) + "hot_button"
+        super().__init__(navilink, channel, "hot_button")
+        self._attr_name = self.metadata.device_name + " Hot Button " + self.metadata.channel_name
 
     @property
     def is_on(self):
@@ -68,52 +36,19 @@ class NavienOnDemandSwitchEntity(SwitchEntity):
 
     async def async_turn_on(self):
         """Turn On Hot Button."""
-        await self.channel.set_hot_button_state(True)
+        await self.async_control(self.channel.set_hot_button_state(True))
 
     async def async_turn_off(self):
         """Turn Off Hot Button."""
-        await self.channel.set_hot_button_state(False)
+        await self.async_control(self.channel.set_hot_button_state(False))
 
 
-class NavienPowerSwitchEntity(SwitchEntity):
+class NavienPowerSwitchEntity(NavienEntity, SwitchEntity):
     """Define a Power Switch Entity."""
 
     def __init__(self, navilink, channel):
-        self.navilink = navilink
-        self.channel = channel
-
-    async def async_added_to_hass(self) -> None:
-        """Run when this Entity has been added to HA."""
-        self.channel.register_callback(self.async_write_ha_state)
-
-    async def async_will_remove_from_hass(self) -> None:
-        """Entity being removed from hass."""
-        self.channel.deregister_callback(self.async_write_ha_state)
-
-    @property
-    def available(self):
-        """Return if the the device is online or not."""
-        return self.channel.is_available()
-
-    @property
-    def device_info(self) -> DeviceInfo:
-        """Return device registry information for this entity."""
-        return DeviceInfo(
-            identifiers = {(DOMAIN, self.navilink.device_info.get("deviceInfo",{}).get("macAddress","unknown") + "_" + str(self.channel.channel_number))},
-            manufacturer = "Navien",
-            name = self.navilink.device_info.get("deviceInfo",{}).get("deviceName","unknown") + " CH" + str(self.channel.channel_number)
-        )
-
-    @property
-    def name(self):
-        """Return the name of the entity."""
-        return self.navilink.device_info.get("deviceInfo",{}).get("deviceName","UNKNOWN") + " Power CH" + str(self.channel.channel_number)
-
-
-    @property
-    def unique_id(self):
-        """Return the unique ID of the entity."""
-        return self.navilink.device_info.get("deviceInfo",{}).get("macAddress","unknown") + str(self.channel.channel_number) + "power_button"
+        super().__init__(navilink, channel, "power_button")
+        self._attr_name = self.metadata.device_name + " Power " + self.metadata.channel_name
 
     @property
     def is_on(self):
@@ -122,8 +57,8 @@ class NavienPowerSwitchEntity(SwitchEntity):
 
     async def async_turn_on(self):
         """Turn On Power."""
-        await self.channel.set_power_state(True)
+        await self.async_control(self.channel.set_power_state(True))
 
     async def async_turn_off(self):
         """Turn Off Power."""
-        await self.channel.set_power_state(False)
\ No newline at end of file
+        await self.async_control(self.channel.set_power_state(False))
\ No newline at end of file
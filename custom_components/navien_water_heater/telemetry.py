@@ -0,0 +1,171 @@
+"""Streaming export of converted channel status updates for the Navien NaviLink hub."""
+import csv
+import io
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+FORMAT_NDJSON = "ndjson"
+FORMAT_CSV = "csv"
+TELEMETRY_FORMATS = [FORMAT_NDJSON, FORMAT_CSV]
+TELEMETRY_FILE_NAME = "telemetry"
+# Columns identifying every record, always written
+KEY_FIELDS = ["ts", "gateway", "channel", "unit"]
+# Channel and unit values exported when no field selection is given
+DEFAULT_FIELDS = [
+    "powerStatus",
+    "onDemandUseFlag",
+    "avgCalorie",
+    "DHWSettingTemp",
+    "avgInletTemp",
+    "avgOutletTemp",
+    "gasInstantUsage",
+    "accumulatedGasUsage",
+    "DHWFlowRate",
+    "currentInletTemp",
+    "currentOutletTemp",
+]
+
+def parse_fields(fields):
+    """Parse a comma separated field selection, an empty selection means DEFAULT_FIELDS"""
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(",")]
+    fields = [field for field in fields or [] if field and field not in KEY_FIELDS]
+    return fields or list(DEFAULT_FIELDS)
+
+class TelemetryExporter:
+    """
+    Stream every converted channel status update to rotating NDJSON or CSV files.
+
+    Each update becomes one record for the channel and one per unit, with the selected fields.
+    record() only puts a reference to the status on a bounded queue, so it never blocks the
+    event loop. Flattening, serialization and file I/O happen on a dedicated writer thread,
+    which writes whatever has queued up in one go. When the queue is full the update is
+    dropped and counted.
+    """
+
+    def __init__(self, path, file_format=FORMAT_NDJSON, fields=None, max_bytes=10*1024*1024, backup_count=5, queue_size=10000) -> None:
+        self.path = path
+        self.file_format = file_format if file_format in TELEMETRY_FORMATS else FORMAT_NDJSON
+        self.fields = parse_fields(fields)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        self.file = None
+        self.file_bytes = 0
+        self.updates = 0
+        self.records = 0
+        self.dropped = 0
+
+    @property
+    def file_name(self):
+        return TELEMETRY_FILE_NAME + "." + self.file_format
+
+    def start(self):
+        if self.thread is None:
+            os.makedirs(self.path, exist_ok=True)
+            self.thread = threading.Thread(target=self._run, name="navien_telemetry", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """Flush pending updates and stop the writer thread, blocks until done so call it from the executor"""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def record(self, gateway, channel_number, channel_status):
+        """Queue a converted channel status, which must not be modified afterwards"""
+        try:
+            self.queue.put_nowait((time.time(), gateway, channel_number, channel_status))
+        except queue.Full:
+            self.dropped += 1
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "format": self.file_format,
+            "fields": self.fields,
+            "updates": self.updates,
+            "records": self.records,
+            "dropped": self.dropped,
+            "queued": self.queue.qsize(),
+        }
+
+    def _run(self):
+        try:
+            while (item := self.queue.get()) is not None:
+                batch = [item]
+                stopping = False
+                # Take whatever else is already queued and write it in one go
+                while True:
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self._write(batch)
+                if stopping:
+                    return
+        except Exception as e:
+            _LOGGER.error("Telemetry export stopped: " + str(type(e).__name__) + ": " + str(e))
+        finally:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def _rows(self, item):
+        timestamp, gateway, channel_number, channel_status = item
+        row = {"ts": round(timestamp, 3), "gateway": gateway, "channel": channel_number, "unit": None}
+        yield row | {field: channel_status[field] for field in self.fields if field in channel_status}
+        for unit_info in channel_status.get("unitInfo",{}).get("unitStatusList",[]):
+            row["unit"] = unit_info.get("unitNumber","")
+            yield row | {field: unit_info[field] for field in self.fields if field in unit_info}
+
+    def _serialize(self, rows):
+        if self.file_format == FORMAT_CSV:
+            buffer = io.StringIO()
+            csv.DictWriter(buffer, KEY_FIELDS + self.fields, lineterminator="\n").writerows(rows)
+            return buffer.getvalue().encode("utf-8")
+        return "".join(json.dumps(row, separators=(',',':')) + "\n" for row in rows).encode("utf-8")
+
+    def _write(self, batch):
+        rows = [row for item in batch for row in self._rows(item)]
+        data = self._serialize(rows)
+        if self.file is None or (self.file_bytes and self.file_bytes + len(data) > self.max_bytes):
+            self._rotate()
+        self.file.write(data)
+        self.file.flush()
+        self.file_bytes += len(data)
+        self.updates += len(batch)
+        self.records += len(rows)
+
+    def _rotate(self):
+        if self.file is not None:
+            self.file.close()
+        current = os.path.join(self.path, self.file_name)
+        if os.path.exists(current):
+            for i in range(self.backup_count - 1, 0, -1):
+                source = self._rotated_file_name(i)
+                if os.path.exists(source):
+                    os.replace(source, self._rotated_file_name(i + 1))
+            if self.backup_count > 0:
+                os.replace(current, self._rotated_file_name(1))
+        self.file = open(current, "wb")
+        self.file_bytes = 0
+        if self.file_format == FORMAT_CSV:
+            header = (",".join(KEY_FIELDS + self.fields) + "\n").encode("utf-8")
+            self.file.write(header)
+            self.file_bytes += len(header)
+
+    def _rotated_file_name(self, index):
+        return os.path.join(self.path, TELEMETRY_FILE_NAME + "." + str(index) + "." + self.file_format)
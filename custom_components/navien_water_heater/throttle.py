@@ -0,0 +1,97 @@
+"""Sensor state write throttling for the Navien NaviLink integration."""
+
+# Sensor types that can be throttled and the names used for them in the options flow
+THROTTLED_SENSOR_TYPES = {
+    "gasInstantUsage": "Current Gas Use",
+    "accumulatedGasUsage": "Cumulative Gas Use",
+    "DHWFlowRate": "Hot Water Flow",
+    "currentInletTemp": "Inlet Temp",
+    "currentOutletTemp": "Hot Water Temp",
+    "avgCalorie": "Heating Power",
+}
+
+def parse_deadband(deadband):
+    """Parse a deadband option, either an absolute value such as "0.5" or a percentage such as "2%"
+
+    Returns a (value, relative) tuple, raises ValueError for anything else.
+    """
+    deadband = str(deadband).strip()
+    relative = deadband.endswith("%")
+    value = float(deadband[:-1] if relative else deadband or 0)
+    if value < 0:
+        raise ValueError("Deadband must not be negative")
+    return (value / 100 if relative else value, relative)
+
+def throttle_settings(options, sensor_type):
+    """Return the StateThrottle settings for a sensor type from the config entry options"""
+    try:
+        deadband, relative = parse_deadband(options.get(sensor_type + "_deadband", "0"))
+    except ValueError:
+        deadband, relative = 0, False
+    return {
+        "deadband": deadband,
+        "relative": relative,
+        "min_interval": options.get(sensor_type + "_min_interval", 0),
+        "heartbeat": options.get(sensor_type + "_heartbeat", 0),
+    }
+
+def throttle_from_options(options, sensor_type):
+    """Build the StateThrottle for a sensor type from the config entry options"""
+    return StateThrottle(**throttle_settings(options, sensor_type))
+
+class StateThrottle:
+    """
+    Decide whether a new sensor value is worth a state write.
+
+    A value is written when it moved by at least the deadband since the last written value
+    (a fraction of that value when relative), but never more often than min_interval seconds.
+    Once heartbeat seconds have passed since the last write, the next value is written whatever
+    it is. Changes of availability and values that are not numbers are always written. With
+    every setting at 0 every value is written, which is the behavior without throttling.
+    """
+
+    __slots__ = ("deadband", "relative", "min_interval", "heartbeat", "last_value", "last_write", "last_available")
+
+    def __init__(self, deadband=0, relative=False, min_interval=0, heartbeat=0) -> None:
+        self.configure(deadband, relative, min_interval, heartbeat)
+        self.last_value = None
+        self.last_write = None
+        self.last_available = None
+
+    def configure(self, deadband=0, relative=False, min_interval=0, heartbeat=0):
+        """Change the settings, keeping the last written value and time"""
+        self.deadband = deadband
+        self.relative = relative
+        self.min_interval = min_interval
+        self.heartbeat = heartbeat
+
+    @property
+    def enabled(self):
+        return bool(self.deadband or self.min_interval)
+
+    def should_write(self, value, now, available=True):
+        if not self.enabled or self._changed(value, available) is None or (self.heartbeat and now - self.last_write >= self.heartbeat):
+            return self._written(value, now, available)
+        if self.min_interval and now - self.last_write < self.min_interval:
+            return False
+        if self._changed(value, available):
+            return self._written(value, now, available)
+        return False
+
+    def _changed(self, value, available):
+        """Return None if the value must be written, otherwise whether it moved past the deadband"""
+        if self.last_write is None or available != self.last_available:
+            return None
+        if not isinstance(value, (int, float)) or not isinstance(self.last_value, (int, float)):
+            return None
+        change = abs(value - self.last_value)
+        threshold = self.deadband * abs(self.last_value) if self.relative else self.deadband
+        if threshold:
+            return change >= threshold
+        return change > 0
+
+    def _written(self, value, now, available):
+        self.last_value = value
+        self.last_write = now
+        self.last_available = available
+        return True
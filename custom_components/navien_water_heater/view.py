@@ -0,0 +1,20 @@
+"""HTTP view serving the OpenMetrics exposition of all NaviLink hubs."""
+from aiohttp import web
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.core import HomeAssistant
+from .const import DOMAIN
+from .openmetrics import CONTENT_TYPE, render
+
+class NavienMetricsView(HomeAssistantView):
+    """Serve device telemetry for scraping, authenticated like the rest of the API (e.g. with a long-lived access token)."""
+
+    url = "/api/" + DOMAIN + "/metrics"
+    name = "api:" + DOMAIN + ":metrics"
+    requires_auth = True
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self.hass = hass
+
+    async def get(self, request: web.Request) -> web.Response:
+        """Render the exposition from the hubs' cached series."""
+        return web.Response(body=render(self.hass.data.get(DOMAIN, {}).values()).encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
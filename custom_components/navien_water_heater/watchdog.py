@@ -0,0 +1,108 @@
+"""Event loop lag watchdog attributing slow work to the integration's handlers."""
+import collections
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import datetime
+
+class LoopWatchdog:
+    """
+    Sample event loop lag and record slow integration callbacks with their stack.
+
+    A watchdog thread pings the loop every interval seconds. The lag of each ping is recorded
+    in the hub's loop_lag histogram from the loop itself. When a ping is not answered within
+    threshold seconds the loop is blocked, and the thread captures the loop thread's current
+    stack together with the integration handler running at that moment, if any. Handlers run
+    under timed(), which records every call taking threshold or longer with the stack captured
+    while it blocked. Records are kept in a bounded buffer, oldest first out.
+    """
+
+    def __init__(self, metrics, threshold=0.1, interval=0.5, buffer_size=50) -> None:
+        self.metrics = metrics
+        self.threshold = threshold
+        self.interval = interval
+        self.slow = collections.deque(maxlen=buffer_size)
+        self.loop = None
+        self.loop_thread_id = None
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.pong = threading.Event()
+        self.running = []
+        self.blocked_stack = None
+
+    def start(self, loop):
+        """Start sampling, must be called from the event loop's thread"""
+        if self.thread is None:
+            self.loop = loop
+            self.loop_thread_id = threading.get_ident()
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._run, name="navien_watchdog", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+
+    @contextmanager
+    def timed(self, name, message_type=""):
+        """Time an integration callback running on the event loop"""
+        self.running.append((name, message_type))
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - started
+            self.running.pop()
+            if duration >= self.threshold:
+                self.metrics.inc("slow_callbacks", name)
+                self.slow.append({
+                    "time": datetime.now().isoformat(),
+                    "name": name,
+                    "message_type": message_type,
+                    "duration": round(duration, 4),
+                    "stack": self.blocked_stack,
+                })
+            if not self.running:
+                self.blocked_stack = None
+
+    def stats(self):
+        return {
+            "threshold": self.threshold,
+            "interval": self.interval,
+            "slow_callbacks": list(self.slow),
+        }
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.pong.clear()
+            try:
+                self.loop.call_soon_threadsafe(self._on_pong, time.monotonic())
+            except RuntimeError:
+                # The loop is closed
+                return
+            if self.pong.wait(self.threshold):
+                continue
+            frame = sys._current_frames().get(self.loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else None
+            if self.running:
+                # The loop is blocked inside one of our callbacks, timed() records it when it returns
+                self.blocked_stack = stack
+            else:
+                self.slow.append({
+                    "time": datetime.now().isoformat(),
+                    "name": "loop_blocked",
+                    "message_type": "",
+                    "duration": None,
+                    "stack": stack,
+                })
+            # Wait for the loop to catch up before the next ping
+            while not self.pong.wait(self.interval) and not self.stop_event.is_set():
+                pass
+
+    def _on_pong(self, pinged):
+        self.metrics.observe("loop_lag", "", time.monotonic() - pinged)
+        self.pong.set()
@@ -0,0 +1,64 @@
+"""
+Fleet wide control latency with the bulk control fan-out.
+
+Starts hubs against the simulator and sends the same temperature change to every channel,
+once one target at a time and once with the given concurrency limits, reporting the total time,
+the slowest target and the results:
+
+    python -m tools.benchmarks.bulk_control --gateways 12 --channels 1 --latency 0.3 --concurrency 1 4 16
+"""
+import argparse
+import asyncio
+import collections
+import logging
+
+from ..integration import load
+from ..navilink_simulator import SimulatedFleet, Simulator
+
+control = load("control")
+
+async def measure(args):
+    fleet = SimulatedFleet.build(gateways_per_account=args.gateways, channels_per_gateway=args.channels)
+    simulator = Simulator(fleet, latency=args.latency)
+    await simulator.start()
+    account = next(iter(fleet.accounts.values()))
+    hubs = [simulator.create_hub(account, gateway_index=index, polling_interval=args.polling_interval) for index in range(args.gateways)]
+    await asyncio.gather(*[hub.start() for hub in hubs])
+
+    targets = control.select_targets(hubs)
+    rows = []
+    for step, concurrency in enumerate(args.concurrency):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        results = await control.async_bulk_control(targets, control.MODE_TEMPERATURE, 110 + step % 2 * 10, concurrency)
+        rows.append({
+            "concurrency": concurrency,
+            "targets": len(targets),
+            "total_s": round(loop.time() - started, 2),
+            "slowest_s": max(result["latency"] for result in results),
+            "results": dict(collections.Counter(result["result"] for result in results)),
+        })
+
+    for hub in hubs:
+        await hub.disconnect()
+    await simulator.stop()
+    for task in asyncio.all_tasks():
+        if task is not asyncio.current_task():
+            task.cancel()
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure fleet wide control latency with the bulk control fan-out")
+    parser.add_argument("--gateways", type=int, default=12)
+    parser.add_argument("--channels", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.3, help="simulated broker latency in seconds")
+    parser.add_argument("--polling-interval", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    for row in asyncio.run(measure(args)):
+        print(row)
+
+if __name__ == "__main__":
+    main()
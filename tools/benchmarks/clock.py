@@ -0,0 +1,34 @@
+"""Event loop running on accelerated time, to simulate hours of hub activity in minutes."""
+import asyncio
+import selectors
+import time
+
+class _ScaledSelector(selectors.DefaultSelector):
+    def __init__(self, speed) -> None:
+        super().__init__()
+        self.speed = speed
+
+    def select(self, timeout=None):
+        if timeout is not None:
+            timeout = timeout / self.speed
+        return super().select(timeout)
+
+class AcceleratedEventLoop(asyncio.SelectorEventLoop):
+    """
+    Event loop whose clock runs speed times faster than real time.
+
+    asyncio.sleep, call_later and wait_for timeouts all follow loop.time(), so a hub polling every
+    15 seconds polls every 15/speed real seconds. datetime.now() is not affected.
+    """
+
+    def __init__(self, speed=1.0) -> None:
+        super().__init__(_ScaledSelector(speed))
+        self.speed = speed
+
+    def time(self):
+        return time.monotonic() * self.speed
+
+def run(coroutine, speed=1.0):
+    """Run a coroutine to completion on an accelerated event loop"""
+    with asyncio.Runner(loop_factory=lambda: AcceleratedEventLoop(speed)) as runner:
+        return runner.run(coroutine)
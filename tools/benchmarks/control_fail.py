@@ -0,0 +1,63 @@
+"""
+Command latency when the gateway rejects commands.
+
+Sends commands to a simulated gateway that refuses a share of them as busy (controlFail code 2,
+retried) and rejects setpoints outside its range (code 1, not retried), and reports the result
+and latency of each kind. Before controlFail responses were correlated with their request,
+every rejected command waited for the full polling interval:
+
+    python -m tools.benchmarks.control_fail --commands 40 --busy-rate 0.3 --latency 0.2
+"""
+import argparse
+import asyncio
+import collections
+import logging
+import statistics
+
+from ..integration import load
+from ..navilink_simulator import SimulatedFleet, Simulator
+
+control = load("control")
+
+async def measure(args):
+    fleet = SimulatedFleet.build()
+    simulator = Simulator(fleet, latency=args.latency, busy_rate=args.busy_rate)
+    await simulator.start()
+    hub = simulator.create_hub(polling_interval=args.polling_interval)
+    await hub.start()
+    channel = hub.channels[1]
+    low = channel.channel_info.get("setupDHWTempMin", 100)
+
+    latencies = collections.defaultdict(list)
+    for i in range(args.commands):
+        # Every fourth command asks for a setpoint below the gateway's minimum
+        setpoint = low - 10 if i % 4 == 3 else low + i % 10
+        kind = "out_of_range" if i % 4 == 3 else "valid"
+        result = (await control.async_bulk_control([(hub, channel)], control.MODE_TEMPERATURE, setpoint))[0]
+        latencies[(kind, result["result"])].append(result["latency"])
+
+    retries = hub.metrics.counter("control_retries")
+    await hub.disconnect()
+    await simulator.stop()
+    for task in asyncio.all_tasks():
+        if task is not asyncio.current_task():
+            task.cancel()
+    return latencies, retries
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure command latency when the gateway rejects commands")
+    parser.add_argument("--commands", type=int, default=40)
+    parser.add_argument("--busy-rate", type=float, default=0.3, help="share of commands the gateway refuses as busy")
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated broker latency in seconds")
+    parser.add_argument("--polling-interval", type=int, default=15)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    latencies, retries = asyncio.run(measure(args))
+    print(f"{'command':<14}{'result':<22}{'count':>7}{'median_s':>10}{'max_s':>8}")
+    for (kind, result), values in sorted(latencies.items()):
+        print(f"{kind:<14}{result:<22}{len(values):>7}{statistics.median(values):>10.2f}{max(values):>8.2f}")
+    print(f"busy retries: {retries}, a rejected command used to wait the polling interval ({args.polling_interval} s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Stand-ins for the Home Assistant entities, so benchmarks run without Home Assistant installed."""
+
+SENSOR_TYPES = ["gasInstantUsage", "accumulatedGasUsage", "DHWFlowRate", "currentInletTemp", "currentOutletTemp"]
+
+class StubEntity:
+    """Registers on a channel like the platform entities and reads the same values on every state write"""
+
+    def __init__(self, channel) -> None:
+        self.channel = channel
+        self.writes = 0
+        self.state = None
+        # Identity is computed once per entity like NavienEntity does
+        device_info = channel.hub.device_info.get("deviceInfo", {})
+        self.unique_id = device_info.get("macAddress", "unknown") + str(channel.channel_number)
+        self.name = device_info.get("deviceName", "unknown") + " CH" + str(channel.channel_number)
+
+    def add(self):
+        self.channel.register_callback(self.async_write_ha_state)
+
+    def remove(self):
+        self.channel.deregister_callback(self.async_write_ha_state)
+
+    def async_write_ha_state(self):
+        self.available = self.channel.is_available()
+        self.state = self.read()
+        self.writes += 1
+
+    def read(self):
+        return None
+
+class StubWaterHeater(StubEntity):
+    def read(self):
+        status = self.channel.channel_status
+        units = status.get("unitInfo", {}).get("unitStatusList", [])
+        current = round(sum(unit.get("currentOutletTemp") for unit in units) / len(units)) if units else None
+        return (status.get("powerStatus", False), status.get("DHWSettingTemp", 0), current)
+
+class StubSwitch(StubEntity):
+    def __init__(self, channel, key) -> None:
+        super().__init__(channel)
+        self.key = key
+
+    def read(self):
+        return self.channel.channel_status.get(self.key, False)
+
+class StubAvgCalorieSensor(StubEntity):
+    def read(self):
+        return self.channel.channel_status.get("avgCalorie", 0)
+
+class StubUnitSensor(StubEntity):
+    def __init__(self, channel, unit_number, sensor_type) -> None:
+        super().__init__(channel)
+        self.unit_number = unit_number
+        self.sensor_type = sensor_type
+
+    def read(self):
+        if unit_info := self.channel.unit_list.get(self.unit_number):
+            return round(unit_info.get(self.sensor_type, 0), 1)
+        return None
+
+def create_entities(channel):
+    """Create the same set of entities the water_heater, switch and sensor platforms would"""
+    entities = [
+        StubWaterHeater(channel),
+        StubSwitch(channel, "powerStatus"),
+        StubSwitch(channel, "onDemandUseFlag"),
+        StubAvgCalorieSensor(channel),
+    ]
+    for unit_number in range(1, channel.channel_info.get("unitCount", 1) + 1):
+        for sensor_type in SENSOR_TYPES:
+            entities.append(StubUnitSensor(channel, unit_number, sensor_type))
+    for entity in entities:
+        entity.add()
+    return entities
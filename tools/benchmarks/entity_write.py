@@ -0,0 +1,116 @@
+"""
+Per state write overhead of entity identity and metadata for a large cascade installation.
+
+Home Assistant reads name, unique_id, device_info, availability and the unit on every state
+write. This compares the property based entities the platforms used to have, which walked
+device_info and rebuilt strings and DeviceInfo on each read, with NavienEntity's values computed
+once per channel. Both are modelled without Home Assistant, so the numbers show the difference
+in identity overhead rather than the full cost of a write:
+
+    python -m tools.benchmarks.entity_write --channels 2 --units 16
+"""
+import argparse
+import time
+
+from ..navilink_simulator import DeviceSorting, SimulatedChannel, TemperatureType, navien_api
+
+DOMAIN = "navien_water_heater"
+SENSOR_NAMES = {"gasInstantUsage": "Current Gas Use", "accumulatedGasUsage": "Cumulative Gas Use", "DHWFlowRate": "Hot Water Flow", "currentInletTemp": "Inlet Temp", "currentOutletTemp": "Hot Water Temp"}
+
+def read_entity(entity):
+    """What a state write reads besides the state itself"""
+    return (entity.name, entity.unique_id, entity.device_info, entity.available, entity.unit)
+
+class PropertySensor:
+    """Identity rebuilt on every read, as the sensors did before NavienEntity"""
+
+    def __init__(self, navilink, channel, unit_number, sensor_type) -> None:
+        self.navilink = navilink
+        self.channel = channel
+        self.unit_info = {"unitNumber": unit_number}
+        self.sensor_type = sensor_type
+
+    @property
+    def available(self):
+        return self.channel.is_available()
+
+    @property
+    def device_info(self):
+        return dict(
+            identifiers = {(DOMAIN, self.navilink.device_info.get("deviceInfo",{}).get("macAddress","unknown") + "_" + str(self.channel.channel_number))},
+            manufacturer = "Navien",
+            name = self.navilink.device_info.get("deviceInfo",{}).get("deviceName","unknown") + " CH" + str(self.channel.channel_number),
+        )
+
+    @property
+    def name(self):
+        if unit_number := self.unit_info.get("unitNumber", None):
+            return "CH" + str(self.channel.channel_number) + "_UNIT" + str(unit_number) + " " + SENSOR_NAMES[self.sensor_type]
+        return "CH" + str(self.channel.channel_number) + " " + SENSOR_NAMES[self.sensor_type]
+
+    @property
+    def unique_id(self):
+        return self.navilink.device_info.get("deviceInfo",{}).get("macAddress","unknown") + str(self.channel.channel_number) + str(self.unit_info.get("unitNumber","")) + self.sensor_type
+
+    @property
+    def unit(self):
+        return "°F" if self.channel.channel_info.get("temperatureType",2) == TemperatureType.FAHRENHEIT.value else "°C"
+
+class CachedSensor:
+    """Identity computed once, as NavienEntity does"""
+
+    def __init__(self, navilink, channel, unit_number, sensor_type) -> None:
+        self.channel = channel
+        reference = PropertySensor(navilink, channel, unit_number, sensor_type)
+        self.name = reference.name
+        self.unique_id = reference.unique_id
+        self.device_info = reference.device_info
+        self.unit = reference.unit
+
+    @property
+    def available(self):
+        return self.channel.is_available()
+
+def build(entity_class, channels, units):
+    hub = navien_api.NavilinkConnect.__new__(navien_api.NavilinkConnect)
+    hub.connected = True
+    hub.gateway_online = True
+    hub.device_info = {"deviceInfo": {"macAddress": "0c0ffee00000", "deviceName": "Benchmark"}}
+    entities = []
+    for channel_number in range(1, channels + 1):
+        simulated = SimulatedChannel(channel_number, DeviceSorting.CAS_NPE2.value, units)
+        channel = navien_api.NavilinkChannel(channel_number, simulated.channel_info()["channel"], hub)
+        for unit_number in range(1, units + 1):
+            for sensor_type in SENSOR_NAMES:
+                entities.append(entity_class(hub, channel, unit_number, sensor_type))
+    return entities
+
+def measure(entities, rounds):
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for entity in entities:
+            read_entity(entity)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(entities) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per write identity overhead of property based and cached entities")
+    parser.add_argument("--channels", type=int, default=2)
+    parser.add_argument("--units", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    results = {}
+    for label, entity_class in [("properties", PropertySensor), ("cached", CachedSensor)]:
+        entities = build(entity_class, args.channels, args.units)
+        results[label] = measure(entities, args.rounds)
+    count = args.channels * args.units * len(SENSOR_NAMES)
+    print(f"{count} sensors, {args.channels} channels x {args.units} units")
+    for label, per_write in results.items():
+        print(f"{label:<12}{per_write:>8.2f} us per write{per_write * count:>12.1f} us per poll")
+    print(f"saved {(1 - results['cached'] / results['properties']) * 100:.0f}% of identity overhead per write")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Time for a hub to notice that its gateway came back online when the online event was missed.
+
+Runs a hub with two channels against the simulator on an accelerated event loop, takes its
+gateway offline with a connection event, then brings it back without one, as if the event was
+lost. The hub only learns about the recovery from the answer to one of its probes. It reports the
+time until the hub considered the gateway online again and the status requests it sent while the
+gateway was offline, once with the probed first channel subscribed and once with only the second
+channel subscribed:
+
+    python -m tools.benchmarks.gateway_recovery --offline-minutes 10 --polling-interval 15
+"""
+import argparse
+import asyncio
+import json
+import logging
+
+from ..navilink_simulator import SimulatedFleet, Simulator
+from .clock import run
+
+async def measure(args, subscribed_channel):
+    fleet = SimulatedFleet.build(channels_per_gateway=2)
+    simulator = Simulator(fleet, latency=args.latency / args.speed)
+    await simulator.start()
+    loop = asyncio.get_running_loop()
+    account = next(iter(fleet.accounts.values()))
+    gateway = account.gateways[0]
+    hub = simulator.create_hub(account, polling_interval=args.polling_interval)
+    await hub.start()
+    hub.channels[subscribed_channel].register_callback(lambda: None)
+    await asyncio.sleep(args.polling_interval * 4)
+
+    requests = []
+    simulator.broker.subscribe(None, "cmd/+/+/status/channelstatus", lambda client, userdata, message: requests.append(message))
+    simulator.broker.set_gateway_online(gateway.mac_address, False)
+    await asyncio.sleep(args.offline_minutes * 60)
+    offline_requests = len(requests)
+
+    # The gateway reconnects, but its online event never reaches the hub
+    gateway.online = True
+    returned_at = loop.time()
+    recovered = None
+    while loop.time() - returned_at < args.minutes * 60:
+        await asyncio.sleep(1)
+        if hub.gateway_online:
+            recovered = loop.time() - returned_at
+            break
+
+    await hub.disconnect()
+    await simulator.stop()
+    return {
+        "subscribed_channel": subscribed_channel,
+        "offline_requests_per_hour": round(offline_requests / args.offline_minutes * 60, 1),
+        "recover_s": round(recovered) if recovered is not None else None,
+        "waited_s": round(args.minutes * 60),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how fast a hub notices its gateway is back when the online event was missed")
+    parser.add_argument("--polling-interval", type=int, default=15)
+    parser.add_argument("--offline-minutes", type=float, default=10, help="simulated minutes the gateway stays offline")
+    parser.add_argument("--minutes", type=float, default=30, help="simulated minutes to wait for the hub to notice")
+    parser.add_argument("--speed", type=float, default=20, help="simulated seconds per real second")
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated broker latency in simulated seconds")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    for subscribed_channel in (1, 2):
+        print(json.dumps(run(measure(args, subscribed_channel), speed=args.speed)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark of cross-thread message delivery from the SDK callback thread into the event loop.
+
+A producer thread plays the SDK's role and hands channel status messages to the hub at a fixed
+rate, in bursts such as a pipelined multi-channel poll or a reconnect would produce. Batched
+delivery through handle_channel_status is compared with the previous one call_soon_threadsafe
+per message, reporting loop wakeups, status updates dispatched after latest-wins coalescing and
+process CPU time per message:
+
+    python -m tools.benchmarks.inbound_delivery --rates 1000 10000 50000 --burst 16
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+
+from ..navilink_simulator import DeviceSorting, TemperatureType
+from ..navilink_simulator.broker import SimulatedMessage
+from .status_pipeline import TOPIC, create_hub, create_payloads
+
+def produce(deliver, payloads, rate, burst):
+    interval = burst / rate
+    next_burst = time.perf_counter()
+    for start in range(0, len(payloads), burst):
+        for payload in payloads[start:start + burst]:
+            deliver(None, None, SimulatedMessage(TOPIC, payload))
+        next_burst += interval
+        if (delay := next_burst - time.perf_counter()) > 0:
+            time.sleep(delay)
+
+async def run_mode(mode, rate, args):
+    hub, simulated, entities = create_hub(DeviceSorting[args.unit_type].value, args.units, TemperatureType.FAHRENHEIT.value)
+    channel = hub.channels[1]
+    payloads = create_payloads(simulated, args.messages)
+    loop = asyncio.get_running_loop()
+    processed = 0
+
+    def count():
+        nonlocal processed
+        processed += 1
+
+    channel.register_callback(count)
+    wakeups = 0
+    if mode == "batched":
+        deliver = hub.handle_channel_status
+    else:
+        def deliver(client, userdata, message):
+            nonlocal wakeups
+            wakeups += 1
+            loop.call_soon_threadsafe(hub.async_handle_channel_status, json.loads(message.payload))
+
+    cpu = time.process_time()
+    wall = time.perf_counter()
+    producer = threading.Thread(target=produce, args=(deliver, payloads, rate, args.burst))
+    producer.start()
+    await loop.run_in_executor(None, producer.join)
+    while hub.inbound_scheduled or (mode != "batched" and processed < len(payloads)):
+        await asyncio.sleep(0)
+    wall = time.perf_counter() - wall
+    cpu = time.process_time() - cpu
+    if mode == "batched":
+        wakeups = hub.metrics.counter("loop_wakeups")
+    return {
+        "mode": mode,
+        "rate": rate,
+        "messages": len(payloads),
+        "wakeups": wakeups,
+        "messages_per_wakeup": round(len(payloads) / wakeups, 2),
+        "dispatched": processed,
+        "cpu_us_per_message": round(cpu / len(payloads) * 1e6, 2),
+        "wall_s": round(wall, 3),
+    }
+
+async def run(args):
+    results = []
+    for rate in args.rates:
+        for mode in ["per-message", "batched"]:
+            results.append(await run_mode(mode, rate, args))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SDK thread to event loop message delivery")
+    parser.add_argument("--rates", type=float, nargs="+", default=[1000, 10000, 50000], help="messages per second")
+    parser.add_argument("--burst", type=int, default=8, help="messages sent back to back")
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--units", type=int, default=1)
+    parser.add_argument("--unit-type", default="NPE2", choices=[sorting.name for sorting in DeviceSorting])
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    columns = list(results[0].keys())
+    print("".join(f"{column:>22}" for column in columns))
+    for result in results:
+        print("".join(f"{str(result[column]):>22}" for column in columns))
+
+if __name__ == "__main__":
+    main()
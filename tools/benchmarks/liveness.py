@@ -0,0 +1,91 @@
+"""
+Time to detect a half-open MQTT connection, with and without liveness tracking.
+
+Runs hubs against the simulator on an accelerated event loop, lets them poll, then stalls
+their connections: the broker keeps the sessions but stops delivering in both directions and
+never reports them offline, like a half-open websocket. It reports how long each hub took to
+give up on the connection and to receive fresh channel status again, and the liveness probes
+and status requests sent while the connections were healthy. With liveness disabled the SDK is
+the only source of disconnects, so a stalled connection is never detected. Each setting is run
+with every channel subscribed and with none, where a healthy hub should send no more requests than
+its keep-alive polls:
+
+    python -m tools.benchmarks.liveness --hubs 5 --polling-interval 15 --minutes 10
+"""
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+
+from ..navilink_simulator import SimulatedFleet, Simulator
+from .clock import run
+
+async def measure(args, liveness_missed, subscribed):
+    fleet = SimulatedFleet.build(gateways_per_account=args.hubs)
+    simulator = Simulator(fleet, latency=args.latency / args.speed)
+    await simulator.start()
+    loop = asyncio.get_running_loop()
+    account = next(iter(fleet.accounts.values()))
+    hubs = [simulator.create_hub(account, gateway_index=index, polling_interval=args.polling_interval, liveness_missed=liveness_missed) for index in range(args.hubs)]
+    await asyncio.gather(*[hub.start() for hub in hubs])
+    if subscribed:
+        for hub in hubs:
+            for channel in hub.channels.values():
+                # Channels without subscribers are only polled for keep-alive
+                channel.register_callback(lambda: None)
+    requests = []
+    simulator.broker.subscribe(None, "cmd/+/+/status/channelstatus", lambda client, userdata, message: requests.append(message))
+    await asyncio.sleep(args.healthy_minutes * 60)
+    healthy_probes = sum(hub.metrics.counter("liveness_probes") for hub in hubs)
+    healthy_requests = len(requests)
+
+    stalled_at = loop.time()
+    stalled = {hub: hub.client for hub in hubs}
+    for client in stalled.values():
+        simulator.broker.stall_client(client)
+    detected = {}
+    recovered = {}
+    while loop.time() - stalled_at < args.minutes * 60 and len(recovered) < len(hubs):
+        await asyncio.sleep(1)
+        for hub in hubs:
+            if hub not in detected and (not hub.connected or hub.client is not stalled[hub]):
+                detected[hub] = loop.time() - stalled_at
+            if hub not in recovered and hub.client is not stalled[hub] and all(channel.last_status_update > stalled_at for channel in hub.channels.values()):
+                recovered[hub] = loop.time() - stalled_at
+
+    for hub in hubs:
+        await hub.disconnect()
+    await simulator.stop()
+    return {
+        "liveness_missed": liveness_missed,
+        "subscribed": subscribed,
+        "hubs": args.hubs,
+        "healthy_probes_per_hour": round(healthy_probes / args.hubs / args.healthy_minutes * 60, 1),
+        "healthy_requests_per_hour": round(healthy_requests / args.hubs / args.healthy_minutes * 60, 1),
+        "detected": len(detected),
+        "median_detect_s": round(statistics.median(detected.values())) if detected else None,
+        "max_detect_s": round(max(detected.values())) if detected else None,
+        "recovered": len(recovered),
+        "median_recover_s": round(statistics.median(recovered.values())) if recovered else None,
+        "stalled_for_s": round(args.minutes * 60),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how fast hubs detect and recover from half-open connections")
+    parser.add_argument("--hubs", type=int, default=5)
+    parser.add_argument("--polling-interval", type=int, default=15)
+    parser.add_argument("--minutes", type=float, default=10, help="simulated minutes to wait for detection and recovery")
+    parser.add_argument("--healthy-minutes", type=float, default=10, help="simulated minutes of healthy polling before the stall")
+    parser.add_argument("--speed", type=float, default=20, help="simulated seconds per real second")
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated broker latency in simulated seconds")
+    parser.add_argument("--liveness-missed", type=int, nargs="+", default=[0, 3], help="settings to compare, 0 disables liveness tracking")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    for liveness_missed in args.liveness_missed:
+        for subscribed in (True, False):
+            print(json.dumps(run(measure(args, liveness_missed, subscribed), speed=args.speed)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Cost of changing the polling interval by reloading the hub versus applying it in place.
+
+Runs a hub against the simulator on an accelerated event loop, polling slowly, then shortens
+the polling interval either the way the integration used to, by unloading the hub and starting
+a new one, or with apply_options() on the running hub. It reports how long the hub was
+unavailable, how long it took until the first status after the change, the messages through
+the broker in the following polls and whether the MQTT session was kept:
+
+    python -m tools.benchmarks.options_apply --from-interval 60 --to-interval 15
+"""
+import argparse
+import asyncio
+import json
+import logging
+
+from ..integration import load
+from ..navilink_simulator import SimulatedFleet, Simulator
+from .clock import run
+
+ratelimit = load("ratelimit")
+
+async def measure(args, in_place):
+    ratelimit._budget = None
+    fleet = SimulatedFleet.build()
+    simulator = Simulator(fleet, latency=args.latency / args.speed, rest_latency=args.rest_latency / args.speed)
+    await simulator.start()
+    loop = asyncio.get_running_loop()
+    updates = []
+    hub = simulator.create_hub(polling_interval=args.from_interval)
+    await hub.start()
+    for channel in hub.channels.values():
+        channel.register_callback(lambda: updates.append(loop.time()))
+    await asyncio.sleep(args.from_interval * 3)
+
+    client = hub.client
+    published = simulator.broker.published
+    changed_at = loop.time()
+    unavailable = 0
+    if in_place:
+        hub.apply_options(polling_interval=args.to_interval)
+    else:
+        await hub.disconnect()
+        hub = simulator.create_hub(polling_interval=args.to_interval)
+        await hub.start()
+        unavailable = loop.time() - changed_at
+        # The new hub's first status arrives while it starts, before any entity subscribed
+        updates.extend(channel.last_status_update for channel in hub.channels.values())
+        for channel in hub.channels.values():
+            channel.register_callback(lambda: updates.append(loop.time()))
+    await asyncio.sleep(args.to_interval * 4)
+
+    after = sorted(update for update in updates if update > changed_at)
+    result = {
+        "change": "apply_options" if in_place else "reload",
+        "unavailable_s": round(unavailable, 1),
+        "first_update_s": round(after[0] - changed_at, 1) if after else None,
+        "messages_after_change": simulator.broker.published - published,
+        "session_kept": hub.client is client,
+    }
+    await hub.disconnect()
+    await simulator.stop()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare reloading and applying a new polling interval in place")
+    parser.add_argument("--from-interval", type=int, default=60)
+    parser.add_argument("--to-interval", type=int, default=15)
+    parser.add_argument("--speed", type=float, default=20, help="simulated seconds per real second")
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated broker latency in simulated seconds")
+    parser.add_argument("--rest-latency", type=float, default=0.5, help="simulated REST API latency in simulated seconds")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    for in_place in (False, True):
+        print(json.dumps(run(measure(args, in_place), speed=args.speed)))
+
+if __name__ == "__main__":
+    main()
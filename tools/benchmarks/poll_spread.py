@@ -0,0 +1,87 @@
+"""
+Load spikes from aligned polls and daily reconnects, with and without the fleet scheduler.
+
+Runs N hubs against the simulator on an accelerated event loop and timestamps every status
+request the broker receives, reporting the peak number of requests in any one second window.
+It also reports how the daily reconnects of the same gateways fall into the refresh window.
+The aligned run replaces the scheduler with one that gives every hub the same phase and
+reconnect time, like the hubs behaved before:
+
+    python -m tools.benchmarks.poll_spread --hubs 50 --polling-interval 15 --minutes 5
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+from ..integration import load
+from ..navilink_simulator import SimulatedFleet, Simulator
+from .clock import run
+from .rate_budget import peak_rate
+
+schedule = load("schedule")
+
+class AlignedScheduler(schedule.FleetScheduler):
+    """Every hub polls at the same phase and reconnects at exactly the refresh hour"""
+
+    def _assign_phases(self):
+        self.phases = {key: 0 for key in self.intervals}
+
+    def refresh_offset(self, key, window=schedule.REFRESH_WINDOW):
+        return 0
+
+async def measure(args, aligned):
+    schedule._scheduler = AlignedScheduler() if aligned else schedule.FleetScheduler()
+    fleet = SimulatedFleet.build(gateways_per_account=args.hubs)
+    speed = args.speed
+    simulator = Simulator(fleet, latency=args.latency / speed)
+    await simulator.start()
+    requests = []
+    simulator.broker.subscribe(None, "cmd/+/+/status/channelstatus", lambda client, userdata, message: requests.append(time.monotonic() * speed))
+
+    account = next(iter(fleet.accounts.values()))
+    hubs = [simulator.create_hub(account, gateway_index=index, polling_interval=args.polling_interval) for index in range(args.hubs)]
+    # Hubs connect at about the same time, as they do when Home Assistant starts
+    await asyncio.gather(*[hub.start() for hub in hubs])
+    for hub in hubs:
+        for channel in hub.channels.values():
+            # Channels without subscribers are only polled for keep-alive
+            channel.register_callback(lambda: None)
+    startup = len(requests)
+    await asyncio.sleep(args.minutes * 60)
+    polls = requests[startup:]
+
+    offsets = sorted(schedule._scheduler.refresh_offset(hub.schedule_key, args.refresh_window) for hub in hubs)
+    for hub in hubs:
+        await hub.disconnect()
+    await simulator.stop()
+    for task in asyncio.all_tasks():
+        if task is not asyncio.current_task():
+            task.cancel()
+    return {
+        "scheduler": "aligned" if aligned else "fleet",
+        "hubs": args.hubs,
+        "polls": len(polls),
+        "peak_polls_1s": peak_rate(polls),
+        "mean_polls_1s": round(len(polls) / (args.minutes * 60), 2),
+        "peak_reconnects_1s": peak_rate(offsets),
+        "reconnect_spread_s": offsets[-1] - offsets[0] if offsets else 0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare poll and reconnect spikes with and without the fleet scheduler")
+    parser.add_argument("--hubs", type=int, default=50)
+    parser.add_argument("--polling-interval", type=int, default=15)
+    parser.add_argument("--minutes", type=float, default=5, help="simulated minutes of polling per run")
+    parser.add_argument("--refresh-window", type=int, default=schedule.REFRESH_WINDOW, help="seconds over which daily reconnects are spread")
+    parser.add_argument("--speed", type=float, default=20, help="simulated seconds per real second")
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated broker latency in simulated seconds")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    for aligned in (True, False):
+        print(json.dumps(run(measure(args, aligned), speed=args.speed)))
+
+if __name__ == "__main__":
+    main()
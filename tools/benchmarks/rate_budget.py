@@ -0,0 +1,127 @@
+"""
+Request rates seen by the NaviLink cloud with and without the shared rate budget.
+
+Runs a fleet of hubs polling at a short interval against the simulator, on an accelerated event
+loop, while one hub after the other sends a command to each of its channels at a fixed interval.
+An observer on the broker timestamps every request, and the peak number of requests in any one
+and ten second window is reported per account and for the whole process, next to the budget. Runs with the
+budget in place and with an unlimited budget are compared:
+
+    python -m tools.benchmarks.rate_budget --accounts 2 --gateways 4 --channels 2 --polling-interval 10 --minutes 10
+"""
+import argparse
+import asyncio
+import collections
+import json
+import logging
+import math
+import time
+
+from ..integration import load
+from ..navilink_simulator import DeviceSorting, SimulatedFleet, Simulator
+from .clock import run
+
+ratelimit = load("ratelimit")
+
+def peak_rate(timestamps, window=1.0):
+    """Most requests in any window seconds"""
+    timestamps = sorted(timestamps)
+    peak = start = 0
+    for end, timestamp in enumerate(timestamps):
+        while timestamp - timestamps[start] >= window:
+            start += 1
+        peak = max(peak, end - start + 1)
+    return peak
+
+async def measure(args, limited):
+    ratelimit._budget = ratelimit.RateBudget() if limited else ratelimit.RateBudget(math.inf, math.inf, math.inf, math.inf)
+    fleet = SimulatedFleet.build(
+        accounts=args.accounts,
+        gateways_per_account=args.gateways,
+        channels_per_gateway=args.channels,
+        unit_type=DeviceSorting.NPE2.value,
+    )
+    speed = args.speed
+    simulator = Simulator(fleet, latency=args.latency / speed)
+    await simulator.start()
+
+    accounts = {gateway.mac_address: account.user_id for account in fleet.accounts.values() for gateway in account.gateways}
+    requests = collections.defaultdict(list)
+
+    def observe(client, userdata, message):
+        mac_address = message.topic.split("/")[2][len("navilink-"):]
+        requests[accounts.get(mac_address)].append(time.monotonic() * speed)
+
+    simulator.broker.subscribe(None, "cmd/+/+/status/channelstatus", observe)
+    simulator.broker.subscribe(None, "cmd/+/+/control", observe)
+
+    hubs = [
+        simulator.create_hub(account, gateway_index=index, polling_interval=args.polling_interval)
+        for account in fleet.accounts.values()
+        for index in range(len(account.gateways))
+    ]
+    await asyncio.gather(*[hub.start() for hub in hubs])
+    for hub in hubs:
+        for channel in hub.channels.values():
+            # Channels without subscribers are only polled for keep-alive
+            channel.register_callback(lambda: None)
+
+    command_latency = []
+
+    async def command_burst(hub):
+        for channel in hub.channels.values():
+            started = asyncio.get_running_loop().time()
+            await channel.set_power_state(True)
+            command_latency.append(asyncio.get_running_loop().time() - started)
+
+    elapsed = 0
+    duration = args.minutes * 60
+    turn = 0
+    while elapsed < duration:
+        step = min(args.command_interval, duration - elapsed)
+        await asyncio.sleep(step)
+        elapsed += step
+        await command_burst(hubs[turn % len(hubs)])
+        turn += 1
+
+    for hub in hubs:
+        await hub.disconnect()
+    await simulator.stop()
+    for task in asyncio.all_tasks():
+        if task is not asyncio.current_task():
+            task.cancel()
+
+    budget = ratelimit._budget
+    all_requests = [timestamp for timestamps in requests.values() for timestamp in timestamps]
+    return {
+        "budget": "limited" if limited else "unlimited",
+        "requests": len(all_requests),
+        "requests_per_s": round(len(all_requests) / duration, 2),
+        "peak_account_1s": max(peak_rate(timestamps) for timestamps in requests.values()),
+        "peak_global_1s": peak_rate(all_requests),
+        "peak_account_10s": max(peak_rate(timestamps, 10) for timestamps in requests.values()),
+        "peak_global_10s": peak_rate(all_requests, 10),
+        "polls_deferred": budget.deferred,
+        "commands_forced": budget.forced,
+        "command_s_max": round(max(command_latency), 2) if command_latency else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare request rates toward the NaviLink cloud with and without the rate budget")
+    parser.add_argument("--accounts", type=int, default=2)
+    parser.add_argument("--gateways", type=int, default=4, help="gateways per account, one hub each")
+    parser.add_argument("--channels", type=int, default=2)
+    parser.add_argument("--polling-interval", type=int, default=10)
+    parser.add_argument("--command-interval", type=float, default=30, help="simulated seconds between commands")
+    parser.add_argument("--minutes", type=float, default=10, help="simulated minutes per run")
+    parser.add_argument("--speed", type=float, default=20, help="simulated seconds per real second")
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated broker latency in simulated seconds")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    print(f"budget: {ratelimit.ACCOUNT_RATE}/s per account (burst {ratelimit.ACCOUNT_BURST}), {ratelimit.GLOBAL_RATE}/s global (burst {ratelimit.GLOBAL_BURST})")
+    for limited in (False, True):
+        print(json.dumps(run(measure(args, limited), speed=args.speed)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Estimate recorder database rows per day with and without sensor state write throttling.
+
+Simulates one day of polling a channel at a fixed interval, runs every status through the hub's
+conversion and counts, per sensor type, the state changes the recorder would store: one row
+each time the written value differs from the previous one. The same statuses are run once with
+every write allowed, once through StateThrottle with the given settings, and once more throttled
+with Home Assistant also polling every entity and writing its current value past the throttle,
+as it did before the entities set should_poll to False:
+
+    python -m tools.benchmarks.recorder_rows --polling-interval 15 --units 4 --unit-type CAS_NPE2
+"""
+import argparse
+import asyncio
+
+from ..integration import load
+from ..navilink_simulator import DeviceSorting, TemperatureType
+from .status_pipeline import create_hub
+
+throttle = load("throttle")
+
+# Home Assistant's default scan interval of polled entities
+ENTITY_POLL_INTERVAL = 30
+
+# Throttling used for the comparison, in the same form as the options flow
+DEFAULT_OPTIONS = {
+    "gasInstantUsage_deadband": "10%",
+    "accumulatedGasUsage_deadband": "0.1",
+    "DHWFlowRate_deadband": "0.5",
+    "currentInletTemp_deadband": "1",
+    "currentOutletTemp_deadband": "1",
+    "avgCalorie_deadband": "5%",
+}
+
+class RowCounter:
+    """Stand-in sensor counting recorder rows for one unit and sensor type"""
+
+    def __init__(self, channel, unit_number, sensor_type, state_throttle, clock) -> None:
+        self.channel = channel
+        self.unit_number = unit_number
+        self.sensor_type = sensor_type
+        self.throttle = state_throttle
+        self.clock = clock
+        self.state = None
+        self.rows = 0
+        channel.register_callback(self.update_state)
+
+    def value(self):
+        if self.sensor_type == "avgCalorie":
+            return self.channel.channel_status.get("avgCalorie", 0)
+        for unit_info in self.channel.channel_status.get("unitInfo", {}).get("unitStatusList", []):
+            if unit_info.get("unitNumber") == self.unit_number:
+                return round(unit_info.get(self.sensor_type, 0), 1)
+
+    def update_state(self):
+        value = self.value()
+        if self.throttle.should_write(value, self.clock[0]):
+            self.write(value)
+
+    def poll(self):
+        """Home Assistant polling the entity writes its current value without asking the throttle"""
+        self.write(self.value())
+
+    def write(self, value):
+        if value != self.state:
+            self.state = value
+            self.rows += 1
+
+async def simulate(args, options, entity_poll_interval=0):
+    hub, simulated, _ = create_hub(DeviceSorting[args.unit_type].value, args.units, TemperatureType.CELSIUS.value if args.celsius else TemperatureType.FAHRENHEIT.value)
+    channel = hub.channels[1]
+    clock = [0.0]
+    counters = [RowCounter(channel, None, "avgCalorie", throttle.throttle_from_options(options, "avgCalorie"), clock)]
+    for unit_number in range(1, simulated.unit_count + 1):
+        for sensor_type in throttle.THROTTLED_SENSOR_TYPES:
+            if sensor_type != "avgCalorie":
+                counters.append(RowCounter(channel, unit_number, sensor_type, throttle.throttle_from_options(options, sensor_type), clock))
+    polls = int(86400 / args.polling_interval)
+    entity_poll = entity_poll_interval
+    for poll in range(polls):
+        clock[0] = poll * args.polling_interval
+        while entity_poll_interval and entity_poll <= clock[0]:
+            for counter in counters:
+                counter.poll()
+            entity_poll += entity_poll_interval
+        hub.async_handle_channel_status({"sessionID": str(poll), "response": {"channelStatus": simulated.channel_status()}})
+    rows = {}
+    for counter in counters:
+        rows[counter.sensor_type] = rows.get(counter.sensor_type, 0) + counter.rows
+    return polls, rows
+
+async def run(args):
+    options = dict(DEFAULT_OPTIONS)
+    for sensor_type in throttle.THROTTLED_SENSOR_TYPES:
+        options[sensor_type + "_min_interval"] = args.min_interval
+        options[sensor_type + "_heartbeat"] = args.heartbeat
+    polls, unthrottled = await simulate(args, {})
+    _, throttled = await simulate(args, options)
+    _, polled = await simulate(args, options, args.entity_poll_interval)
+    return polls, unthrottled, throttled, polled
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare recorder rows per day with and without throttling")
+    parser.add_argument("--polling-interval", type=int, default=15)
+    parser.add_argument("--units", type=int, default=1)
+    parser.add_argument("--unit-type", default="NPE2", choices=[sorting.name for sorting in DeviceSorting])
+    parser.add_argument("--celsius", action="store_true")
+    parser.add_argument("--min-interval", type=int, default=60)
+    parser.add_argument("--heartbeat", type=int, default=3600)
+    parser.add_argument("--entity-poll-interval", type=int, default=ENTITY_POLL_INTERVAL, help="seconds between Home Assistant polls of the entities in the polled run")
+    args = parser.parse_args()
+
+    polls, unthrottled, throttled, polled = asyncio.run(run(args))
+    print(f"{polls} polls per day, deadbands {DEFAULT_OPTIONS}, min interval {args.min_interval}s, heartbeat {args.heartbeat}s")
+    print(f"{'sensor type':<22}{'rows/day':>12}{'throttled':>12}{'saved':>10}{'entity polled':>16}{'saved':>10}")
+    for sensor_type, rows in unthrottled.items():
+        saved = f"{(1 - throttled[sensor_type] / rows) * 100:.0f}%" if rows else ""
+        saved_polled = f"{(1 - polled[sensor_type] / rows) * 100:.0f}%" if rows else ""
+        print(f"{sensor_type:<22}{rows:>12}{throttled[sensor_type]:>12}{saved:>10}{polled[sensor_type]:>16}{saved_polled:>10}")
+    total, total_throttled, total_polled = sum(unthrottled.values()), sum(throttled.values()), sum(polled.values())
+    print(f"{'total':<22}{total:>12}{total_throttled:>12}{(1 - total_throttled / total) * 100:>9.0f}%{total_polled:>16}{(1 - total_polled / total) * 100:>9.0f}%")
+
+if __name__ == "__main__":
+    main()
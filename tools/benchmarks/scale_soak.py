@@ -0,0 +1,187 @@
+"""
+Scale and soak harness running many NavilinkConnect hubs in one process.
+
+For each fleet size N, N hubs (one gateway per account) are started against the local NaviLink
+simulator and run for a number of simulated hours on an accelerated event loop, with forced
+reconnects of every client at a fixed interval. While they run the harness samples thread count,
+RSS, event loop lag and open sockets, and after the hubs are disconnected it counts the asyncio
+tasks and response events left behind. The result is one row per N, i.e. the scaling curves:
+
+    python -m tools.benchmarks.scale_soak --hubs 1 10 50 200 --hours 4 --speed 120
+
+The simulated broker does not start the AWS SDK's own client threads, so real deployments add
+those on top of the thread counts reported here.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import statistics
+import threading
+import time
+
+from ..navilink_simulator import DeviceSorting, SimulatedFleet, Simulator
+from .clock import run
+
+def rss_bytes():
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def open_sockets():
+    try:
+        fds = os.listdir("/proc/self/fd")
+    except OSError:
+        return None
+    count = 0
+    for fd in fds:
+        try:
+            if os.readlink(os.path.join("/proc/self/fd", fd)).startswith("socket:"):
+                count += 1
+        except OSError:
+            pass
+    return count
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+class Sampler:
+    """Collects process samples and event loop lag while the hubs run"""
+
+    def __init__(self, speed, probe_interval=0.05) -> None:
+        self.speed = speed
+        self.probe_interval = probe_interval
+        self.lags = []
+        self.threads = []
+        self.rss = []
+        self.sockets = []
+        self.tasks = []
+
+    async def probe_lag(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.probe_interval * self.speed)
+            self.lags.append(max(0.0, time.perf_counter() - start - self.probe_interval))
+
+    async def sample(self, interval):
+        while True:
+            self.threads.append(threading.active_count())
+            self.rss.append(rss_bytes())
+            self.sockets.append(open_sockets())
+            self.tasks.append(len(asyncio.all_tasks()))
+            await asyncio.sleep(interval)
+
+async def soak(hub_count, args):
+    fleet = SimulatedFleet.build(
+        accounts=hub_count,
+        channels_per_gateway=args.channels,
+        unit_count=args.units,
+        unit_type=DeviceSorting[args.unit_type].value,
+    )
+    speed = args.speed
+    simulator = Simulator(fleet, latency=args.latency / speed, drop_rate=args.drop_rate)
+    await simulator.start()
+    baseline_tasks = len(asyncio.all_tasks())
+    baseline_threads = threading.active_count()
+
+    hubs = [simulator.create_hub(account, polling_interval=args.polling_interval) for account in fleet.accounts.values()]
+    started = time.perf_counter()
+    await asyncio.gather(*[hub.start() for hub in hubs])
+    startup = time.perf_counter() - started
+    for hub in hubs:
+        for channel in hub.channels.values():
+            # Channels without subscribers are only polled for keep-alive
+            channel.register_callback(lambda: None)
+
+    sampler = Sampler(speed)
+    probes = [asyncio.create_task(sampler.probe_lag()), asyncio.create_task(sampler.sample(args.sample_interval))]
+    reconnects = 0
+    elapsed = 0.0
+    duration = args.hours * 3600
+    while elapsed < duration:
+        step = min(args.reconnect_interval or duration, duration - elapsed)
+        await asyncio.sleep(step)
+        elapsed += step
+        if args.reconnect_interval and elapsed < duration:
+            simulator.broker.drop_all_clients()
+            reconnects += 1
+    for probe in probes:
+        probe.cancel()
+    await asyncio.gather(*probes, return_exceptions=True)
+
+    for hub in hubs:
+        await hub.disconnect()
+    await asyncio.sleep(args.settle)
+    leaked_tasks = len(asyncio.all_tasks()) - baseline_tasks
+    leaked_events = sum(len(hub.response_events) for hub in hubs)
+    threads_after = threading.active_count() - baseline_threads
+    polls = sum(hub.metrics.counter("requests_sent", "channelstatus") for hub in hubs)
+    timeouts = sum(hub.metrics.counter("request_timeouts") for hub in hubs)
+    await simulator.stop()
+    for task in asyncio.all_tasks():
+        if task is not asyncio.current_task():
+            task.cancel()
+
+    return {
+        "hubs": hub_count,
+        "startup_s": round(startup, 2),
+        "reconnects_forced": reconnects,
+        "status_requests": polls,
+        "timeouts": timeouts,
+        "threads_max": max(sampler.threads),
+        "rss_mb_max": round(max(sampler.rss) / 1048576, 1),
+        "sockets_max": max((count for count in sampler.sockets if count is not None), default=None),
+        "tasks_max": max(sampler.tasks),
+        "loop_lag_ms_p50": round(statistics.median(sampler.lags) * 1000, 2) if sampler.lags else None,
+        "loop_lag_ms_p99": round(percentile(sampler.lags, 0.99) * 1000, 2) if sampler.lags else None,
+        "loop_lag_ms_max": round(max(sampler.lags) * 1000, 2) if sampler.lags else None,
+        "leaked_tasks": leaked_tasks,
+        "leaked_response_events": leaked_events,
+        "threads_after_disconnect": threads_after,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many NavilinkConnect hubs against the NaviLink simulator")
+    parser.add_argument("--hubs", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--hours", type=float, default=1, help="simulated hours per fleet size")
+    parser.add_argument("--speed", type=float, default=60, help="simulated seconds per real second")
+    parser.add_argument("--polling-interval", type=int, default=15)
+    parser.add_argument("--reconnect-interval", type=float, default=1800, help="simulated seconds between forced reconnects, 0 for none")
+    parser.add_argument("--sample-interval", type=float, default=60, help="simulated seconds between process samples")
+    parser.add_argument("--settle", type=float, default=60, help="simulated seconds to wait after disconnecting before counting leaks")
+    parser.add_argument("--channels", type=int, default=1)
+    parser.add_argument("--units", type=int, default=1)
+    parser.add_argument("--unit-type", default="NPE2", choices=[sorting.name for sorting in DeviceSorting])
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated broker latency in simulated seconds")
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the hubs' log output")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING if args.verbose else logging.CRITICAL)
+
+    results = []
+    for hub_count in args.hubs:
+        result = run(soak(hub_count, args), speed=args.speed)
+        results.append(result)
+        print(json.dumps(result))
+    columns = list(results[0].keys())
+    print()
+    print("".join(f"{column:>{max(len(column), 6) + 2}}" for column in columns))
+    for result in results:
+        print("".join(f"{str(result[column]):>{max(len(column), 6) + 2}}" for column in columns))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Microbenchmark of the inbound channel status pipeline.
+
+Feeds synthetic channel status messages for every DeviceSorting type and a range of unit counts
+through handle_channel_status, async_handle_channel_status, convert_channel_status and
+publish_update into stub entities, and reports per message:
+
+- time_us: best of several runs, including the hop onto the event loop
+- peak_bytes: tracemalloc high-water mark while one message is processed
+- retained_bytes: memory still held after the message was processed
+- retained_blocks: memory blocks still held after the message was processed, from the difference
+  between tracemalloc snapshots taken before and after the sample messages
+
+Results are compared against a stored baseline so regressions show up as percentages:
+
+    python -m tools.benchmarks.status_pipeline                  # compare with the baseline
+    python -m tools.benchmarks.status_pipeline --save-baseline  # store a new baseline
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import time
+import tracemalloc
+
+from ..navilink_simulator import DeviceSorting, SimulatedChannel, TemperatureType, navien_api
+from ..navilink_simulator.broker import SimulatedMessage
+from .entities import create_entities
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "status_pipeline.json")
+UNIT_COUNTS = [1, 2, 4, 8, 16]
+TOPIC = "cmd/1/1000/1/benchmark/res/channelstatus"
+
+def create_hub(unit_type, unit_count, temperature_type):
+    """Create a hub with one channel and its stub entities without connecting anywhere"""
+    simulated = SimulatedChannel(1, unit_type, unit_count, temperature_type)
+    hub = navien_api.NavilinkConnect("benchmark", "benchmark", polling_interval=0)
+    hub.connected = True
+    hub.device_info = {"deviceInfo": {"macAddress": "0c0ffee00000", "deviceName": "Benchmark"}}
+    channel = navien_api.NavilinkChannel(1, simulated.channel_info()["channel"], hub)
+    hub.channels = {1: channel}
+    entities = create_entities(channel)
+    return hub, simulated, entities
+
+def create_payloads(simulated, count):
+    return [
+        json.dumps({"sessionID": str(i), "response": {"channelStatus": simulated.channel_status()}}, separators=(',',':')).encode("utf-8")
+        for i in range(count)
+    ]
+
+async def deliver(hub, entity, payload):
+    writes = entity.writes
+    hub.handle_channel_status(None, None, SimulatedMessage(TOPIC, payload))
+    while entity.writes == writes:
+        await asyncio.sleep(0)
+
+async def run_case(unit_type, unit_count, temperature_type, messages, repeat):
+    hub, simulated, entities = create_hub(unit_type, unit_count, temperature_type)
+    payloads = create_payloads(simulated, messages)
+    entity = entities[0]
+    for payload in payloads[:10]:
+        await deliver(hub, entity, payload)
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for payload in payloads:
+            await deliver(hub, entity, payload)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    samples = payloads[:20]
+    tracemalloc.start()
+    # Leave tracemalloc's own bookkeeping out of the snapshot difference
+    untraced = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    snapshot = tracemalloc.take_snapshot().filter_traces(untraced)
+    peak = 0
+    before = tracemalloc.get_traced_memory()[0]
+    for payload in samples:
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        await deliver(hub, entity, payload)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+    retained = (tracemalloc.get_traced_memory()[0] - before) / len(samples)
+    retained_blocks = sum(stat.count_diff for stat in tracemalloc.take_snapshot().filter_traces(untraced).compare_to(snapshot, "filename")) / len(samples)
+    tracemalloc.stop()
+
+    return {
+        "time_us": round(best / messages * 1e6, 2),
+        "peak_bytes": peak,
+        "retained_bytes": round(retained),
+        "retained_blocks": round(retained_blocks, 1),
+        "entities": len(entities),
+    }
+
+def case_name(unit_type, unit_count, temperature_type):
+    return DeviceSorting(unit_type).name + "-" + TemperatureType(temperature_type).name[0] + "-u" + str(unit_count)
+
+async def run(args):
+    results = {}
+    unit_types = [sorting.value for sorting in DeviceSorting if sorting != DeviceSorting.NO_DEVICE and (not args.types or sorting.name in args.types)]
+    for temperature_type in [TemperatureType.FAHRENHEIT.value, TemperatureType.CELSIUS.value]:
+        for unit_type in unit_types:
+            for unit_count in args.units:
+                results[case_name(unit_type, unit_count, temperature_type)] = await run_case(unit_type, unit_count, temperature_type, args.messages, args.repeat)
+    return results
+
+def report(results, baseline):
+    print(f"{'case':<22}{'time_us':>10}{'peak_bytes':>12}{'retained':>10}{'blocks':>8}{'vs baseline':>14}{'blocks before':>15}")
+    for name, result in results.items():
+        delta = ""
+        blocks_before = ""
+        if previous := baseline.get(name):
+            delta = f"{(result['time_us'] / previous['time_us'] - 1) * 100:+.1f}%"
+            blocks_before = previous.get("retained_blocks", "")
+        print(f"{name:<22}{result['time_us']:>10.2f}{result['peak_bytes']:>12}{result['retained_bytes']:>10}{result['retained_blocks']:>8}{delta:>14}{blocks_before:>15}")
+    if baseline:
+        common = [name for name in results if name in baseline]
+        if common:
+            ratio = sum(results[name]["time_us"] for name in common) / sum(baseline[name]["time_us"] for name in common)
+            print(f"total time vs baseline over {len(common)} cases: {(ratio - 1) * 100:+.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the inbound channel status pipeline")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--units", type=int, nargs="+", default=UNIT_COUNTS)
+    parser.add_argument("--types", nargs="+", help="DeviceSorting names to run, default all")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file).get("cases", {})
+    report(results, baseline)
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "cases": results}, file, indent=2)
+            file.write("\n")
+
+if __name__ == "__main__":
+    main()
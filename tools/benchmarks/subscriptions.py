@@ -0,0 +1,93 @@
+"""
+Connect time and broker subscriptions with wildcard subscriptions versus one per topic.
+
+Starts hubs against the simulator, whose subscribe calls block for a SUBACK round trip, and
+reports the time until each hub's start() returned, the subscribe calls made through the shared
+executor and the subscriptions the broker has to match every message against. The per topic
+run replaces the hub's subscriptions with one per topic as they were before the routing table,
+with and without the optional topics:
+
+    python -m tools.benchmarks.subscriptions --hubs 10 --subscribe-latency 0.1
+"""
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import time
+
+from ..integration import load
+from ..navilink_simulator import SimulatedFleet, Simulator
+
+navien_api = load("navien_api")
+ratelimit = load("ratelimit")
+
+class PerTopicHub(navien_api.NavilinkConnect):
+    """Subscribes to every topic separately, with its own callback"""
+
+    async def _subscribe_to_topics(self):
+        topics = [
+            (self.topics.channel_info_sub(), self.handle_other),
+            (self.topics.channel_info_res(), self.handle_channel_info),
+            (self.topics.control_fail(), self.handle_control_fail),
+            (self.topics.channel_status_sub(), self.handle_other),
+            (self.topics.channel_status_res(), self.handle_channel_status),
+            (self.topics.connection(), self.handle_connection),
+            (self.topics.disconnect(), self.handle_disconnect_event),
+        ]
+        if self.subscribe_all_topics:
+            for name in navien_api.OPTIONAL_TOPICS:
+                topics.append((self.topics.sub(name), self.handle_other))
+                topics.append((self.topics.res + name, self.handle_other))
+        for topic, callback in topics:
+            await self.async_subscribe(topic=topic, callback=callback)
+
+async def measure(args, per_topic, all_topics):
+    # Every run starts with a full request budget
+    ratelimit._budget = None
+    fleet = SimulatedFleet.build(gateways_per_account=args.hubs)
+    simulator = Simulator(fleet, latency=args.latency, subscribe_latency=args.subscribe_latency)
+    await simulator.start()
+    account = next(iter(fleet.accounts.values()))
+    hub_class = PerTopicHub if per_topic else navien_api.NavilinkConnect
+    hubs = [
+        hub_class(account.user_id, account.password, device_index=index, polling_interval=args.polling_interval, subscribe_all_topics=all_topics,
+                  web_server=simulator.web_server, mqtt_client_factory=simulator.broker.client)
+        for index in range(args.hubs)
+    ]
+
+    async def start(hub):
+        started = time.monotonic()
+        await hub.start()
+        return time.monotonic() - started
+
+    connect_times = await asyncio.gather(*[start(hub) for hub in hubs])
+    subscribe_calls = sum(hub.metrics.histogram("executor_wait", "subscribe").count for hub in hubs)
+    subscriptions = len(simulator.broker.subscriptions)
+    for hub in hubs:
+        await hub.disconnect()
+    await simulator.stop()
+    return {
+        "subscriptions": "per topic" if per_topic else "wildcard",
+        "optional_topics": all_topics,
+        "hubs": args.hubs,
+        "median_connect_s": round(statistics.median(connect_times), 2),
+        "max_connect_s": round(max(connect_times), 2),
+        "subscribe_calls": subscribe_calls,
+        "broker_subscriptions": subscriptions,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare connect time and subscriptions of wildcard and per topic subscriptions")
+    parser.add_argument("--hubs", type=int, default=10)
+    parser.add_argument("--subscribe-latency", type=float, default=0.1, help="seconds each subscribe call waits for its SUBACK")
+    parser.add_argument("--latency", type=float, default=0.1, help="simulated broker latency in seconds")
+    parser.add_argument("--polling-interval", type=int, default=15)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    for per_topic, all_topics in ((True, False), (True, True), (False, False), (False, True)):
+        print(json.dumps(asyncio.run(measure(args, per_topic, all_topics))))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Throughput of the telemetry exporter.
+
+Queues converted channel status updates as fast as possible, like a large fleet would from the
+event loop, and measures the cost of record() on the caller, the updates and rows per second the
+writer thread sustains until everything is on disk, the bytes written and how many updates a
+bounded queue dropped:
+
+    python -m tools.benchmarks.telemetry_export --updates 50000 --units 1 16 --formats ndjson csv
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from ..integration import load
+from ..navilink_simulator import DeviceSorting, SimulatedChannel, navien_api
+
+telemetry = load("telemetry")
+
+def create_statuses(unit_count, count=64):
+    """Converted statuses of a simulated channel, reused round robin"""
+    simulated = SimulatedChannel(1, DeviceSorting.CAS_NPE2.value if unit_count > 1 else DeviceSorting.NPE2.value, unit_count)
+    channel = navien_api.NavilinkChannel(1, simulated.channel_info()["channel"], None)
+    return [channel.convert_channel_status(simulated.channel_status()["channel"]) for _ in range(count)]
+
+def measure(file_format, unit_count, updates, queue_size, fields):
+    statuses = create_statuses(unit_count)
+    with tempfile.TemporaryDirectory() as path:
+        exporter = telemetry.TelemetryExporter(path, file_format, fields, max_bytes=64*1024*1024, queue_size=queue_size)
+        exporter.start()
+        started = time.perf_counter()
+        for i in range(updates):
+            exporter.record("0c0ffee00000", 1, statuses[i % len(statuses)])
+        recorded = time.perf_counter() - started
+        exporter.stop()
+        elapsed = time.perf_counter() - started
+        size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return {
+        "format": file_format,
+        "units": unit_count,
+        "record_us": round(recorded / updates * 1e6, 2),
+        "updates_per_s": round(exporter.updates / elapsed),
+        "rows_per_s": round(exporter.records / elapsed),
+        "mb": round(size / 1048576, 1),
+        "dropped": exporter.dropped,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the telemetry exporter's throughput")
+    parser.add_argument("--updates", type=int, default=50000)
+    parser.add_argument("--units", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--formats", nargs="+", default=telemetry.TELEMETRY_FORMATS, choices=telemetry.TELEMETRY_FORMATS)
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--fields", default="", help="comma separated field selection, the defaults if empty")
+    args = parser.parse_args()
+
+    columns = ["format", "units", "record_us", "updates_per_s", "rows_per_s", "mb", "dropped"]
+    print("".join(f"{column:>15}" for column in columns))
+    for file_format in args.formats:
+        for unit_count in args.units:
+            result = measure(file_format, unit_count, args.updates, args.queue_size, args.fields)
+            print("".join(f"{str(result[column]):>15}" for column in columns))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Check the cold import cost of the integration's modules against a budget.
+
+Each run imports the Home Assistant independent modules in a fresh interpreter, after aiohttp
+which Home Assistant always has loaded, and measures the wall time. The check fails if the median
+over the runs exceeds the budget or if a module that must only be imported lazily was loaded:
+
+    python -m tools.import_budget --budget-ms 50
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+MODULES = ["navien_api", "throttle", "metrics", "capture", "executor", "ratelimit", "telemetry", "openmetrics", "control", "schedule", "watchdog", "supervisor"]
+# Only imported once an MQTT connection is made
+LAZY_MODULES = ["AWSIoTPythonSDK"]
+
+PROBE = """
+import json, sys, time
+import aiohttp
+from tools.integration import load
+started = time.perf_counter()
+for module in {modules!r}:
+    load(module)
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "loaded": [name for name in {lazy!r} if name in sys.modules]}}))
+"""
+
+def measure(modules):
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(modules=modules, lazy=LAZY_MODULES)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the integration's cold import time and lazy imports")
+    parser.add_argument("--budget-ms", type=float, default=50)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    results = [measure(MODULES) for _ in range(args.runs)]
+    median_ms = statistics.median(result["seconds"] for result in results) * 1000
+    loaded = sorted({name for result in results for name in result["loaded"]})
+    print(f"cold import of {', '.join(MODULES)}: {median_ms:.1f} ms median over {args.runs} runs, budget {args.budget_ms:.0f} ms")
+    failed = False
+    if median_ms > args.budget_ms:
+        print("FAIL: import time over budget")
+        failed = True
+    if loaded:
+        print("FAIL: imported eagerly: " + ", ".join(loaded))
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+"""Load the integration's Home Assistant independent modules for offline tools."""
+import importlib
+import os
+import sys
+import types
+
+PACKAGE = "navien_water_heater"
+INTEGRATION_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "custom_components", PACKAGE)
+
+def load(module="navien_api"):
+    """
+    Import a module of the integration without running its __init__.py, which needs Home Assistant.
+
+    The package is registered as a bare namespace so the modules' relative imports still resolve.
+    """
+    if PACKAGE not in sys.modules:
+        package = types.ModuleType(PACKAGE)
+        package.__path__ = [INTEGRATION_DIR]
+        sys.modules[PACKAGE] = package
+    return importlib.import_module(PACKAGE + "." + module)
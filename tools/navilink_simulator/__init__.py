@@ -0,0 +1,62 @@
+"""
+Local stand-in for the NaviLink cloud.
+
+Runs a fake REST API (sign-in and device list) and an in-process MQTT broker whose simulated
+gateways answer channel info, channel status and control requests, so NavilinkConnect can be
+exercised offline:
+
+    simulator = Simulator(SimulatedFleet.build(gateways_per_account=2, unit_count=4, unit_type=DeviceSorting.CAS_NPE2.value))
+    await simulator.start()
+    hub = simulator.create_hub(gateway_index=0)
+    await hub.start()
+"""
+import asyncio
+
+from aiohttp import web
+
+from .broker import SimulatedBroker, SimulatedMQTTClient, topic_matches
+from .fleet import DeviceSorting, SimulatedChannel, SimulatedFleet, SimulatedGateway, TemperatureType, navien_api
+from .rest import API_PREFIX, create_app
+
+class Simulator:
+    """Owns the REST server and the broker for one simulated fleet"""
+
+    def __init__(self, fleet, rest_latency=0.0, host="127.0.0.1", port=0, **broker_options) -> None:
+        self.fleet = fleet
+        self.rest_latency = rest_latency
+        self.host = host
+        self.port = port
+        self.broker = SimulatedBroker(fleet, **broker_options)
+        self.runner = None
+
+    @property
+    def web_server(self):
+        return "http://" + self.host + ":" + str(self.port) + API_PREFIX
+
+    async def start(self):
+        self.broker.start()
+        self.runner = web.AppRunner(create_app(self.fleet, self.rest_latency))
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        if not self.port:
+            self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+        await asyncio.get_running_loop().run_in_executor(None, self.broker.stop)
+
+    def create_hub(self, account=None, gateway_index=0, **kwargs):
+        """Create a NavilinkConnect pointed at the simulator, kwargs are passed through"""
+        account = account or next(iter(self.fleet.accounts.values()))
+        kwargs.setdefault("polling_interval", 15)
+        return navien_api.NavilinkConnect(
+            account.user_id,
+            account.password,
+            device_index=gateway_index,
+            web_server=self.web_server,
+            mqtt_client_factory=self.broker.client,
+            **kwargs,
+        )
@@ -0,0 +1,51 @@
+"""Run a simulated fleet and a hub per gateway, printing channel status as it arrives."""
+import argparse
+import asyncio
+import logging
+
+from . import DeviceSorting, SimulatedFleet, Simulator, TemperatureType
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run NavilinkConnect hubs against a local NaviLink stand-in")
+    parser.add_argument("--gateways", type=int, default=1)
+    parser.add_argument("--channels", type=int, default=1)
+    parser.add_argument("--units", type=int, default=1, help="units per channel for cascade unit types")
+    parser.add_argument("--unit-type", default="NPE2", choices=[sorting.name for sorting in DeviceSorting])
+    parser.add_argument("--celsius", action="store_true")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--polling-interval", type=int, default=10)
+    parser.add_argument("--disconnect-every", type=float, default=0, help="drop every client connection every N seconds")
+    parser.add_argument("--duration", type=float, default=60)
+    return parser.parse_args()
+
+async def main(args):
+    fleet = SimulatedFleet.build(
+        gateways_per_account=args.gateways,
+        channels_per_gateway=args.channels,
+        unit_count=args.units,
+        unit_type=DeviceSorting[args.unit_type].value,
+        temperature_type=TemperatureType.CELSIUS.value if args.celsius else TemperatureType.FAHRENHEIT.value,
+    )
+    simulator = Simulator(fleet, latency=args.latency, jitter=args.jitter, drop_rate=args.drop_rate)
+    await simulator.start()
+    hubs = [simulator.create_hub(gateway_index=index, polling_interval=args.polling_interval) for index in range(args.gateways)]
+    await asyncio.gather(*[hub.start() for hub in hubs])
+    for hub in hubs:
+        for channel in hub.channels.values():
+            channel.register_callback(lambda hub=hub, channel=channel: print(hub.device_info["deviceInfo"]["deviceName"], "CH" + str(channel.channel_number), channel.channel_status.get("DHWSettingTemp"), [unit["currentOutletTemp"] for unit in channel.channel_status["unitInfo"]["unitStatusList"]]))
+    elapsed = 0.0
+    while elapsed < args.duration:
+        step = min(args.disconnect_every or args.duration, args.duration - elapsed)
+        await asyncio.sleep(step)
+        elapsed += step
+        if args.disconnect_every and elapsed < args.duration:
+            simulator.broker.drop_all_clients()
+    for hub in hubs:
+        await hub.disconnect()
+    await simulator.stop()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(main(parse_args()))
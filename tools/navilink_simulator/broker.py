@@ -0,0 +1,281 @@
+"""Stand-in for the AWS IoT MQTT broker and the NaviLink gateways behind it."""
+import heapq
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+REQUEST_PREFIX = "cmd/"
+
+def topic_matches(topic_filter, topic):
+    """Return True if topic matches an MQTT topic filter with + and # wildcards"""
+    filter_parts = topic_filter.split("/")
+    topic_parts = topic.split("/")
+    for i, part in enumerate(filter_parts):
+        if part == "#":
+            return True
+        if i >= len(topic_parts):
+            return False
+        if part != "+" and part != topic_parts[i]:
+            return False
+    return len(filter_parts) == len(topic_parts)
+
+class SimulatedMessage:
+    """Same shape as the paho message handed to AWSIoTPythonSDK callbacks"""
+
+    __slots__ = ("topic", "payload")
+
+    def __init__(self, topic, payload) -> None:
+        self.topic = topic
+        self.payload = payload
+
+class SimulatedMQTTClient:
+    """Drop-in for AWSIoTMQTTClient, pass SimulatedBroker.client as NavilinkConnect's mqtt_client_factory"""
+
+    def __init__(self, broker, client_id) -> None:
+        self.broker = broker
+        self.client_id = client_id
+        self.online = False
+        self.onOnline = None
+        self.onOffline = None
+
+    def configureEndpoint(self, hostName, portNumber):
+        pass
+
+    def configureUsernamePassword(self, username, password=None):
+        pass
+
+    def configureLastWill(self, topic, payload, QoS, retain=False):
+        self.last_will = (topic, payload)
+
+    def configureCredentials(self, CAFilePath, KeyPath="", CertificatePath=""):
+        pass
+
+    def configureIAMCredentials(self, AWSAccessKeyID, AWSSecretAccessKey, AWSSessionToken=""):
+        pass
+
+    def configureConnectDisconnectTimeout(self, timeoutSecond):
+        pass
+
+    def connect(self, keepAliveIntervalSecond=600):
+        self.broker.connect(self)
+        return True
+
+    def disconnect(self):
+        self.broker.disconnect(self)
+        return True
+
+    def subscribe(self, topic, QoS, callback):
+        if not self.online:
+            raise ConnectionError("Client is offline")
+        if self.broker.subscribe_latency:
+            # The SDK blocks until the broker acknowledges the subscription
+            time.sleep(self.broker.subscribe_latency)
+        self.broker.subscribe(self, topic, callback)
+        return True
+
+    def unsubscribe(self, topic):
+        self.broker.unsubscribe(self, topic)
+        return True
+
+    def publish(self, topic, payload, QoS):
+        if not self.online:
+            raise ConnectionError("Client is offline")
+        if self in self.broker.stalled:
+            # A half-open connection accepts the write, it just never arrives
+            return True
+        self.broker.publish(topic, payload)
+        return True
+
+class SimulatedBroker:
+    """
+    In-process MQTT broker that answers channel info, channel status and control requests the
+    way NaviLink gateways do.
+
+    Messages are delivered on a single dispatcher thread, like the SDK's callback thread.
+    Every response is delayed by latency plus a random jitter and is dropped with probability
+    drop_rate. Gateways that are offline never answer. With broadcast enabled, status responses
+    are also published to the gateway's res/channelstatus topic as real gateways do. Control
+    commands the gateway cannot apply are answered with controlFail code 1, and with probability
+    busy_rate a command is refused with code 2 (busy) without being applied. A stalled client
+    keeps its session but no longer sends or receives anything, like a half-open websocket.
+    Subscribing blocks the client for subscribe_latency seconds, the SUBACK round trip.
+    """
+
+    def __init__(self, fleet, latency=0.05, jitter=0.0, drop_rate=0.0, broadcast=True, seed=0, busy_rate=0.0, subscribe_latency=0.0) -> None:
+        self.fleet = fleet
+        self.subscribe_latency = subscribe_latency
+        self.busy_rate = busy_rate
+        self.latency = latency
+        self.jitter = jitter
+        self.drop_rate = drop_rate
+        self.broadcast = broadcast
+        self.rng = random.Random(seed)
+        self.clients = set()
+        self.stalled = set()
+        self.subscriptions = []
+        self.pending = []
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.thread = None
+        self.running = False
+        self.published = 0
+        self.delivered = 0
+
+    def client(self, client_id):
+        return SimulatedMQTTClient(self, client_id)
+
+    def start(self):
+        if self.thread is None:
+            self.running = True
+            self.thread = threading.Thread(target=self._run, name="navilink_simulated_broker", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        if self.thread is not None:
+            with self.condition:
+                self.running = False
+                self.condition.notify()
+            self.thread.join()
+            self.thread = None
+
+    def connect(self, client):
+        with self.condition:
+            self.clients.add(client)
+            client.online = True
+        if client.onOnline:
+            client.onOnline()
+
+    def disconnect(self, client):
+        """Client initiated disconnect, the SDK reports it through onOffline as well"""
+        self.drop_client(client)
+
+    def drop_client(self, client):
+        """Simulate the broker closing a client's connection"""
+        with self.condition:
+            if client not in self.clients:
+                return
+            self.clients.discard(client)
+            self.stalled.discard(client)
+            client.online = False
+            self.subscriptions = [subscription for subscription in self.subscriptions if subscription[1] is not client]
+        if client.onOffline:
+            self._schedule(0, client.onOffline)
+
+    def stall_client(self, client):
+        """Simulate a half-open connection, the client is neither told nor sent anything anymore"""
+        with self.condition:
+            if client in self.clients:
+                self.stalled.add(client)
+
+    def drop_all_clients(self):
+        for client in list(self.clients):
+            self.drop_client(client)
+
+    def subscribe(self, client, topic_filter, callback):
+        with self.condition:
+            self.subscriptions.append((topic_filter, client, callback))
+
+    def unsubscribe(self, client, topic_filter):
+        with self.condition:
+            self.subscriptions = [subscription for subscription in self.subscriptions if subscription[:2] != (topic_filter, client)]
+
+    def publish(self, topic, payload, delay=0):
+        """Publish a message, routing requests addressed to a simulated gateway"""
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        with self.condition:
+            self.published += 1
+            targets = [(client, callback) for topic_filter, client, callback in self.subscriptions if client not in self.stalled and topic_matches(topic_filter, topic)]
+        for client, callback in targets:
+            self._schedule(delay, callback, client, None, SimulatedMessage(topic, payload))
+        if topic.startswith(REQUEST_PREFIX):
+            self._handle_request(topic, payload)
+
+    def set_gateway_online(self, mac_address, online):
+        """Change a gateway's connection state and publish its connection event"""
+        gateway = self.fleet.gateways[mac_address]
+        gateway.online = online
+        topic = REQUEST_PREFIX + str(gateway.device_type) + "/navilink-" + mac_address + "/connection"
+        self.publish(topic, json.dumps({
+            "protocolVersion": 1,
+            "event": {"connection": {"status": 1 if online else 0}, "deviceType": gateway.device_type, "macAddress": mac_address},
+        }))
+
+    def _handle_request(self, topic, payload):
+        parts = topic.split("/", 3)
+        if len(parts) < 4 or not parts[2].startswith("navilink-"):
+            return
+        gateway = self.fleet.gateways.get(parts[2][len("navilink-"):])
+        if gateway is None or not gateway.online:
+            return
+        if self.drop_rate and self.rng.random() < self.drop_rate:
+            return
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        action = parts[3]
+        request = message.get("request", {})
+        base = REQUEST_PREFIX + parts[1] + "/" + parts[2] + "/"
+        response_topic = message.get("responseTopic", "")
+        delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0)
+        if action == "status/start":
+            response = {"channelInfo": {"channelList": [channel.channel_info() for channel in gateway.channels.values()]}}
+            self.publish(response_topic, self._response(message, response), delay)
+        elif action == "status/channelstatus":
+            channel = gateway.channels.get(request.get("status", {}).get("channelNumber"))
+            if channel:
+                self._publish_status(base, response_topic, message, channel, delay)
+        elif action == "control":
+            control = request.get("control", {})
+            channel = gateway.channels.get(control.get("channelNumber"))
+            param = (control.get("param") or [None])[0]
+            if self.busy_rate and self.rng.random() < self.busy_rate:
+                fail_code = 2
+            elif channel and channel.control(control.get("mode"), param):
+                self._publish_status(base, response_topic, message, channel, delay)
+                return
+            else:
+                fail_code = 1
+            response = {"controlFail": {"channelNumber": control.get("channelNumber"), "mode": control.get("mode"), "failCode": fail_code}}
+            self.publish(base + "res/controlfail", self._response(message, response), delay)
+
+    def _publish_status(self, base, response_topic, message, channel, delay):
+        payload = self._response(message, {"channelStatus": channel.channel_status()})
+        self.publish(response_topic, payload, delay)
+        if self.broadcast:
+            self.publish(base + "res/channelstatus", payload, delay)
+
+    def _response(self, message, response):
+        return json.dumps({
+            "clientID": message.get("clientID", ""),
+            "protocolVersion": 1,
+            "requestTopic": message.get("requestTopic", ""),
+            "responseTopic": message.get("responseTopic", ""),
+            "sessionID": message.get("sessionID", ""),
+            "response": response,
+        }, separators=(',',':'))
+
+    def _schedule(self, delay, func, *args):
+        with self.condition:
+            heapq.heappush(self.pending, (time.monotonic() + delay, next(self.sequence), func, args))
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.running and (not self.pending or self.pending[0][0] > time.monotonic()):
+                    self.condition.wait(self.pending[0][0] - time.monotonic() if self.pending else None)
+                if not self.running:
+                    return
+                _, _, func, args = heapq.heappop(self.pending)
+            try:
+                func(*args)
+                self.delivered += 1
+            except Exception:
+                _LOGGER.exception("Error in simulated message delivery")
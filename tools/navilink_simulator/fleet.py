@@ -0,0 +1,178 @@
+"""Simulated NaviLink gateways, channels and cascaded units."""
+import random
+
+from ..integration import load
+
+navien_api = load("navien_api")
+DeviceSorting = navien_api.DeviceSorting
+TemperatureType = navien_api.TemperatureType
+
+CASCADE_TYPES = {
+    DeviceSorting.CAS_NPE.value,
+    DeviceSorting.CAS_NHB.value,
+    DeviceSorting.CAS_NFB.value,
+    DeviceSorting.CAS_NPN.value,
+    DeviceSorting.CAS_NPE2.value,
+    DeviceSorting.CAS_NVW.value,
+}
+
+class SimulatedChannel:
+    """
+    One channel of a gateway, holding its state and producing raw payloads in device units.
+
+    Raw units follow what convert_channel_status undoes: Celsius temperatures and avgCalorie are
+    doubled, gas and flow values are in tenths.
+    """
+
+    def __init__(self, channel_number, unit_type, unit_count=1, temperature_type=TemperatureType.FAHRENHEIT.value, on_demand_use=1, rng=None) -> None:
+        self.channel_number = channel_number
+        self.unit_type = unit_type
+        self.unit_count = unit_count
+        self.temperature_type = temperature_type
+        self.on_demand_use = on_demand_use
+        self.rng = rng or random.Random(channel_number)
+        self.power = True
+        self.on_demand = False
+        self.celsius = temperature_type == TemperatureType.CELSIUS.value
+        self.temp_min = 80 if self.celsius else 100
+        self.temp_max = 120 if self.celsius else 140
+        self.setting_temp = 100 if self.celsius else 120
+        self.accumulated_gas = [self.rng.randint(1000, 100000) for _ in range(unit_count)]
+        self.inlet_range = (20, 30) if self.celsius else (50, 65)
+        self.inlet = [self.rng.randint(*self.inlet_range) for _ in range(unit_count)]
+
+    def channel_info(self):
+        return {
+            "channelNumber": self.channel_number,
+            "channel": {
+                "unitType": self.unit_type,
+                "unitCount": self.unit_count,
+                "temperatureType": self.temperature_type,
+                "setupDHWTempMin": self.temp_min,
+                "setupDHWTempMax": self.temp_max,
+                "onDemandUse": self.on_demand_use,
+            },
+        }
+
+    def channel_status(self):
+        units = []
+        for unit_number in range(1, self.unit_count + 1):
+            flowing = self.power and self.rng.random() < 0.3
+            # Inlet temperature drifts slowly, everything else follows whether water is flowing
+            inlet = min(max(self.inlet[unit_number - 1] + self.rng.choice((-1, 0, 0, 0, 1)), self.inlet_range[0]), self.inlet_range[1])
+            self.inlet[unit_number - 1] = inlet
+            outlet = self.setting_temp + self.rng.randint(-2, 2) if flowing else inlet + self.rng.randint(0, 10)
+            gas = self.rng.randint(100, 1500) if flowing else 0
+            self.accumulated_gas[unit_number - 1] += gas // 100
+            units.append({
+                "unitNumber": unit_number,
+                "gasInstantUsage": gas,
+                "accumulatedGasUsage": self.accumulated_gas[unit_number - 1],
+                "DHWFlowRate": self.rng.randint(10, 60) if flowing else 0,
+                "currentOutletTemp": outlet,
+                "currentInletTemp": inlet,
+            })
+        avg_outlet = round(sum(unit["currentOutletTemp"] for unit in units) / len(units))
+        avg_inlet = round(sum(unit["currentInletTemp"] for unit in units) / len(units))
+        return {
+            "channelNumber": self.channel_number,
+            "channel": {
+                "unitType": self.unit_type,
+                "unitCount": self.unit_count,
+                "powerStatus": 1 if self.power else 2,
+                "onDemandUseFlag": 1 if self.on_demand else 2,
+                "avgCalorie": self.rng.randint(0, 200) if self.power else 0,
+                "DHWSettingTemp": self.setting_temp,
+                "avgInletTemp": avg_inlet,
+                "avgOutletTemp": avg_outlet,
+                "unitInfo": {"unitStatusList": units},
+            },
+        }
+
+    def control(self, mode, param):
+        """Apply a control command, return False if the gateway would reject it"""
+        if mode == "power":
+            self.power = param == 1
+        elif mode == "onDemand":
+            if self.on_demand_use != 1:
+                return False
+            self.on_demand = param == 1
+        elif mode == "DHWTemperature":
+            if not self.temp_min <= param <= self.temp_max:
+                return False
+            self.setting_temp = param
+        else:
+            return False
+        return True
+
+class SimulatedGateway:
+    """A NaviLink gateway with one or more channels"""
+
+    def __init__(self, index, channels, device_type=1, home_seq=1000, rng=None) -> None:
+        self.index = index
+        self.mac_address = "{:012x}".format(0x0C0FFEE00000 + index)
+        self.device_name = "Simulated Navien " + str(index)
+        self.device_type = device_type
+        self.home_seq = home_seq
+        self.additional_value = "sim" + str(index)
+        self.channels = {channel.channel_number: channel for channel in channels}
+        self.online = True
+        self.rng = rng or random.Random(index)
+
+    def device_info(self):
+        return {
+            "deviceInfo": {
+                "macAddress": self.mac_address,
+                "deviceName": self.device_name,
+                "homeSeq": self.home_seq,
+                "deviceType": self.device_type,
+                "additionalValue": self.additional_value,
+            }
+        }
+
+class SimulatedAccount:
+    """A NaviLink user account owning a list of gateways"""
+
+    def __init__(self, user_id, password, user_seq, gateways) -> None:
+        self.user_id = user_id
+        self.password = password
+        self.user_seq = user_seq
+        self.gateways = gateways
+
+class SimulatedFleet:
+    """All accounts and gateways served by the simulator"""
+
+    def __init__(self) -> None:
+        self.accounts = {}
+        self.gateways = {}
+
+    def add_account(self, user_id, password, gateways):
+        account = SimulatedAccount(user_id, password, len(self.accounts) + 1, gateways)
+        self.accounts[user_id] = account
+        for gateway in gateways:
+            self.gateways[gateway.mac_address] = gateway
+        return account
+
+    @classmethod
+    def build(cls, accounts=1, gateways_per_account=1, channels_per_gateway=1, unit_count=1, unit_type=DeviceSorting.NPE2.value, temperature_type=TemperatureType.FAHRENHEIT.value, seed=0):
+        """Build a homogeneous fleet, cascade unit types get unit_count units per channel, others one"""
+        fleet = cls()
+        rng = random.Random(seed)
+        index = 0
+        for account_number in range(accounts):
+            gateways = []
+            for _ in range(gateways_per_account):
+                channels = [
+                    SimulatedChannel(
+                        channel_number,
+                        unit_type,
+                        unit_count if unit_type in CASCADE_TYPES else 1,
+                        temperature_type,
+                        rng=random.Random(rng.random()),
+                    )
+                    for channel_number in range(1, channels_per_gateway + 1)
+                ]
+                gateways.append(SimulatedGateway(index, channels, rng=random.Random(rng.random())))
+                index += 1
+            fleet.add_account("user" + str(account_number) + "@example.com", "password", gateways)
+        return fleet
@@ -0,0 +1,52 @@
+"""Stand-in for the NaviLink REST API."""
+import asyncio
+import uuid
+
+from aiohttp import web
+
+API_PREFIX = "/api/v2"
+
+def create_app(fleet, latency=0.0):
+    """Create an aiohttp application implementing /user/sign-in and /device/list for the fleet"""
+    app = web.Application()
+    tokens = {}
+
+    async def sign_in(request):
+        await asyncio.sleep(latency)
+        body = await request.json()
+        account = fleet.accounts.get(body.get("userId"))
+        if account is None or account.password != body.get("password"):
+            return web.json_response({"code": 400, "msg": "USER_NOT_FOUND"})
+        access_token = str(uuid.uuid4())
+        tokens[access_token] = account
+        return web.json_response({
+            "code": 200,
+            "msg": "SUCCESS",
+            "data": {
+                "userInfo": {"userSeq": account.user_seq, "userId": account.user_id},
+                "token": {
+                    "accessToken": access_token,
+                    "accessKeyId": "SIMULATEDACCESSKEY",
+                    "secretKey": "simulated-secret",
+                    "sessionToken": "simulated-session",
+                },
+            },
+        })
+
+    async def device_list(request):
+        await asyncio.sleep(latency)
+        account = tokens.get(request.headers.get("Authorization", ""))
+        if account is None:
+            return web.json_response({"code": 401, "msg": "UNAUTHORIZED"}, status=401)
+        body = await request.json()
+        offset = body.get("offset", 0)
+        count = body.get("count", 20)
+        return web.json_response({
+            "code": 200,
+            "msg": "SUCCESS",
+            "data": [gateway.device_info() for gateway in account.gateways[offset:offset + count]],
+        })
+
+    app.router.add_post(API_PREFIX + "/user/sign-in", sign_in)
+    app.router.add_post(API_PREFIX + "/device/list", device_list)
+    return app
@@ -0,0 +1,104 @@
+"""
+Check that reloading the integration leaks no tasks, subscriptions or memory.
+
+Each cycle starts a hub against the simulator, subscribes to its channels, lets it poll, drops
+its MQTT connection so it reconnects, and unloads it the way Home Assistant does. After every
+cycle it counts the running asyncio tasks, the broker's clients and subscriptions, the hubs
+still registered with the shared executor and scheduler, the hub objects still alive and the
+traced memory. The check fails if any of them grows after the warm up cycles:
+
+    python -m tools.reload_cycles --cycles 50
+"""
+import argparse
+import asyncio
+import gc
+import logging
+import sys
+import threading
+import tracemalloc
+import weakref
+
+from .benchmarks.clock import run
+from .integration import load
+from .navilink_simulator import SimulatedFleet, Simulator
+
+executor = load("executor")
+schedule = load("schedule")
+
+COUNTS = ["tasks", "clients", "subscriptions", "executor_users", "scheduled_hubs", "hubs_alive", "threads"]
+
+async def cycle(simulator, args, hubs):
+    hub = simulator.create_hub(polling_interval=args.polling_interval)
+    hubs.add(hub)
+    await hub.start()
+    for channel in hub.channels.values():
+        channel.register_callback(lambda: None)
+    await asyncio.sleep(args.polling_interval * 2)
+    if args.reset:
+        # The broker closes the connection, the hub reconnects after its backoff
+        simulator.broker.drop_client(hub.client)
+        await asyncio.sleep(hub.supervisor.backoff + args.polling_interval)
+    await hub.disconnect()
+
+def sample(simulator, hubs):
+    gc.collect()
+    return {
+        "tasks": len([task for task in asyncio.all_tasks() if task is not asyncio.current_task()]),
+        "clients": len(simulator.broker.clients),
+        "subscriptions": len(simulator.broker.subscriptions),
+        "executor_users": executor._users,
+        "scheduled_hubs": len(schedule.get_fleet_scheduler().intervals),
+        "hubs_alive": len(hubs),
+        "threads": threading.active_count(),
+        "memory": tracemalloc.get_traced_memory()[0],
+    }
+
+async def measure(args):
+    fleet = SimulatedFleet.build()
+    simulator = Simulator(fleet, latency=args.latency / args.speed)
+    await simulator.start()
+    hubs = weakref.WeakSet()
+    samples = []
+    tracemalloc.start()
+    for _ in range(args.cycles):
+        await cycle(simulator, args, hubs)
+        # Let the executor and broker threads finish what the unload handed them
+        await asyncio.sleep(args.polling_interval)
+        samples.append(sample(simulator, hubs))
+    tracemalloc.stop()
+    await simulator.stop()
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that hub reload cycles leak no tasks, subscriptions or memory")
+    parser.add_argument("--cycles", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5, help="cycles after which the counts must stay flat")
+    parser.add_argument("--polling-interval", type=int, default=15)
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated broker latency in seconds")
+    parser.add_argument("--speed", type=float, default=50, help="how much faster than real time the event loop runs")
+    parser.add_argument("--no-reset", dest="reset", action="store_false", help="do not drop the connection in each cycle")
+    parser.add_argument("--memory-budget-kb", type=float, default=256, help="allowed memory growth after the warm up")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+
+    samples = run(measure(args), args.speed)
+    print(f"{'cycle':>6}" + "".join(f"{name:>16}" for name in COUNTS) + f"{'memory_kb':>12}")
+    for index, values in enumerate(samples, 1):
+        if index <= args.warmup or index % max(1, args.cycles // 10) == 0 or index == len(samples):
+            print(f"{index:>6}" + "".join(f"{values[name]:>16}" for name in COUNTS) + f"{values['memory'] / 1024:>12.0f}")
+
+    baseline = samples[min(args.warmup, len(samples)) - 1]
+    failed = False
+    for name in COUNTS:
+        if (peak := max(values[name] for values in samples[args.warmup:] or samples)) > baseline[name]:
+            print(f"FAIL: {name} grew from {baseline[name]} to {peak}")
+            failed = True
+    growth = (samples[-1]["memory"] - baseline["memory"]) / 1024
+    print(f"memory growth after warm up: {growth:.0f} KiB over {len(samples) - args.warmup} cycles, budget {args.memory_budget_kb:.0f} KiB")
+    if growth > args.memory_budget_kb:
+        print("FAIL: memory grew over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()